@@ -1,10 +1,20 @@
-import speech_recognition as sr
+from startup import get_startup_timer
+startup_timer = get_startup_timer()
+with startup_timer.timed("import.speech"):
+    import speech_recognition as sr
+    import speech_worker
+    from audio_capture import AudioCapture
+    from speech_gate import create_gate
+    from recognizers import create_backend, recognize_segment
 import os
 import platform
-import time
-import pyttsx3
+from app_registry import AppRegistry
+from file_index import create_file_index
+from intent_cache import as_spoken, normalize_command
+from pipeline import Pipeline
+from router import Router
+from tracing import get_tracer
 import subprocess
-import pyautogui
 
 def get_desktop_path():
     """Gets the path to the user's desktop."""
@@ -15,13 +25,20 @@ def get_desktop_path():
     else:
         return None
 
+# Files and folders on the desktop and other ALFRED_INDEX_ROOTS, indexed in the background once listening starts
+file_index = create_file_index()
+
 def create_folder(folder_name):
     """Creates a folder on the desktop."""
     desktop_path = get_desktop_path()
     if desktop_path:
         folder_path = os.path.join(desktop_path, folder_name)
+        if file_index.exists(folder_path):
+            return False, "Folder already exists."
         try:
+            # Still checked here, for a folder created since the index was asked
             os.makedirs(folder_path)
+            file_index.add(folder_path, is_dir=True)
             return True, folder_path
         except FileExistsError:
             return False, "Folder already exists."
@@ -30,11 +47,9 @@ def create_folder(folder_name):
     else:
         return False, "Unsupported operating system."
 
-def speak(text):
-    """Speaks the given text."""
-    engine = pyttsx3.init()
-    engine.say(text)
-    engine.runAndWait()
+def speak(text, wait=False):
+    """Speaks the given text on the shared speech worker without blocking."""
+    speech_worker.speak(text, wait=wait)
 
 def sleep_pc():
     """Puts the PC to sleep."""
@@ -58,42 +73,25 @@ def lock_pc():
     else:
         speak("Lock command not supported on this operating system.")
 
+# Applications that can be opened, with launchers resolved once for this platform (APPLICATIONS_PATH)
+app_registry = AppRegistry()
+
+def is_known_application(application_name):
+    """Tells whether the spoken name matches an application in the registry."""
+    return app_registry.find(application_name) is not None
+
 def open_application(application_name):
-    """Opens the specified application."""
+    """Opens the specified application, or brings it to the front if it is already running."""
+    application = app_registry.find(application_name)
+    if application is None:
+        speak(f"Application '{application_name}' not recognized.")
+        return
     try:
-        if application_name == "vs code":
-            if platform.system() == "Windows":
-                subprocess.Popen(["D:\Microsoft VS Code\Code.exe"]) #OS_AUTOMATION Enter your file location of vs code
-            elif platform.system() == "Linux":
-                subprocess.Popen(["code"])
-            elif platform.system() == "Darwin":
-                subprocess.Popen(["open", "-a", "Visual Studio Code"])
-        elif application_name == "notepad":
-            if platform.system() == "Windows":
-                subprocess.Popen(["C:\\Windows\\System32\\notepad.exe"]) #OS_AUTOMATION Enter your file location of Notepad
-            elif platform.system() == "Linux":
-                subprocess.Popen(["gedit"])
-            elif platform.system() == "Darwin":
-                subprocess.Popen(["open", "-a", "TextEdit"])
-        elif application_name == "this pc":
-            if platform.system() == "Windows":
-                subprocess.Popen(["explorer.exe", "::{20D04FE0-3AEA-1069-A2D8-08002B30309D}"])
-            else:
-                speak("This PC command only supported on windows")
-        elif application_name == "recycle bin":
-            if platform.system() == "Windows":
-                subprocess.Popen(["explorer.exe", "shell:RecycleBinFolder"])
-            else:
-                speak("Recycle bin command only supported on windows")
-        elif application_name == "file explorer":
-            if platform.system() == "Windows":
-                subprocess.Popen(["explorer.exe"])
-            elif platform.system() == "Linux":
-                subprocess.Popen(["xdg-open", os.path.expanduser("~")])
-            elif platform.system() == "Darwin":
-                subprocess.Popen(["open", os.path.expanduser("~")])
-        else:
-            speak(f"Application '{application_name}' not recognized.")
+        result = app_registry.open(application)
+        if result == "unavailable":
+            speak(application.unsupported)
+        elif result == "focused":
+            speak(f"Switched to {application.name}.")
     except FileNotFoundError:
         speak(f"Application '{application_name}' not found.")
     except Exception as e:
@@ -103,6 +101,8 @@ def close_tabs(number_of_tabs):
     """Closes the specified number of tabs."""
     try:
         number_of_tabs = int(number_of_tabs)
+        # pyautogui takes a while to import and is only needed here
+        import pyautogui
         for _ in range(number_of_tabs):
             pyautogui.hotkey('ctrl', 'w')
         speak(f"{number_of_tabs} tabs closed.")
@@ -111,70 +111,176 @@ def close_tabs(number_of_tabs):
     except Exception as e:
         speak(f"An error occurred while closing tabs: {e}")
 
+def recognize_query(backend, audio, gate=None):
+    """Turns a captured utterance into a query, or None if it was not understood."""
+    try:
+        print("Recognizing...")
+        query = recognize_segment(backend, audio)
+    except sr.UnknownValueError:
+        print("Could not understand audio.")
+        speak("Could not understand audio.")
+        return None
+    except sr.RequestError as e:
+        print(f"Could not request results; {e}")
+        speak(f"Could not request results; {e}")
+        return None
+    print(f"User said: {query}")
+    if gate is not None:
+        query = gate.accept_text(query, audio)
+        if not query:
+            # The wake phrase on its own opens the wake window for the next command
+            if query == "":
+                speak("Yes?")
+            return None
+    speech_worker.interrupt_speech()
+    return query
+
+def create_folder_command(folder_name):
+    """Creates a folder and reports the result."""
+    success, message = create_folder(folder_name)
+    if success:
+        print(f"Folder '{folder_name}' created successfully.")
+        print(f"Folder path: {message}")
+        speak("New folder created.")
+    else:
+        print(message)
+        speak(message)
+
+def spoken_file_name(text):
+    """Strips the words around a spoken file name, as in "find file named budget"."""
+    words = text.split()
+    while words and words[0].lower() in ("named", "called", "the", "my"):
+        words = words[1:]
+    return " ".join(words)
+
+def find_file_command(name):
+    """Reports the indexed files and folders that best match a spoken name."""
+    name = spoken_file_name(name)
+    if not name:
+        speak("Which file or folder should I find?")
+        return
+    matches = file_index.find(name)
+    if not matches:
+        speak(f"No file or folder named {name} found.")
+        return
+    for match in matches:
+        print(f"{match['score']:.2f}  {match['path']}")
+    best = os.path.basename(matches[0]["path"])
+    speak(f"Found {best}." if len(matches) == 1 else f"Found {len(matches)} matches. The best is {best}.")
+
+def open_file_command(name):
+    """Opens the indexed file or folder that best matches a spoken name."""
+    name = spoken_file_name(name)
+    if not name:
+        speak("Which file or folder should I open?")
+        return
+    matches = file_index.find(name, limit=1)
+    if not matches:
+        speak(f"No file or folder named {name} found.")
+        return
+    path = matches[0]["path"]
+    print(f"Opening {path}")
+    try:
+        if platform.system() == "Windows":
+            os.startfile(path)
+        elif platform.system() == "Darwin":
+            subprocess.Popen(["open", path])
+        else:
+            subprocess.Popen(["xdg-open", path])
+        speak(f"Opening {os.path.basename(path)}.")
+    except Exception as e:
+        speak(f"An error occurred while opening '{name}': {e}")
+
+# Phrases that start each OS command, in the order they are checked; the rest of the query is its target
+OS_COMMANDS = [
+    ("create new folder", "create_folder"),
+    ("sleep pc", "sleep_pc"),
+    ("lock pc", "lock_pc"),
+    ("find file", "find_file"),
+    ("find folder", "find_file"),
+    ("open file", "open_file"),
+    ("open folder", "open_file"),
+    ("open", "open_application"),
+    ("close tabs", "close_tabs"),
+]
+
+def parse_os_command(query):
+    """Parses an OS command into an {intent, target, parameters} dict, or returns None.
+
+    The query must start with the command's phrase, after any wake phrase or filler words;
+    the target keeps its case, e.g. a folder or file name.
+    """
+    text = normalize_command(query)
+    spoken = as_spoken(query, text)
+    for phrase, intent in OS_COMMANDS:
+        if text == phrase or text.startswith(phrase + " "):
+            return {"intent": intent, "target": spoken[len(phrase):].strip(), "parameters": {}}
+    return None
+
+def register_os_handlers(router):
+    """Adds a handler for every OS intent to a Router."""
+    router.register("create_folder", lambda command, count: create_folder_command(command["target"] or "New Folder"))
+    router.register("sleep_pc", lambda command, count: sleep_pc(), "Going to sleep.")
+    router.register("lock_pc", lambda command, count: lock_pc(), "Locking the PC.")
+    router.register("open_application", lambda command, count: open_application(command["target"]))
+    router.register("close_tabs", lambda command, count: close_tabs(command["target"]))
+    router.register("find_file", lambda command, count: find_file_command(command["target"]))
+    router.register("open_file", lambda command, count: open_file_command(command["target"]))
+    return router
+
+os_router = register_os_handlers(Router())
+
+def plan_query(query):
+    """Parses a query and starts its acknowledgement, which plays while the action runs."""
+    command = parse_os_command(query)
+    if command is None:
+        print("Command not recognized.")
+        speak("Command not recognized.")
+        return None
+    acknowledgement = os_router.route(command).acknowledgement
+    if acknowledgement:
+        speak(acknowledgement)
+    return command
+
+def execute_action(command):
+    """Runs the handler of a parsed command."""
+    os_router.dispatch(command)
+    tracer = get_tracer()
+    tracer.finish(tracer.current(), command["intent"])
+
 def voice_assistant():
     """Voice assistant that handles various commands."""
-    recognizer = sr.Recognizer()
+    with startup_timer.timed("init.asr_backend"):
+        backend = create_backend()
+    # The speech engine starts in the background, so listening does not wait for it
+    startup_timer.warm("init.speech_engine", speech_worker.get_speech_worker)
+    file_index.start()
 
-    while True:
-        try:
-            with sr.Microphone() as source:
-                print("Listening...")
-                speak("Listening...")
-                recognizer.adjust_for_ambient_noise(source)
-                audio = recognizer.listen(source, timeout=5)
-
-            print("Recognizing...")
-            speak("Recognizing...")
-            query = recognizer.recognize_google(audio).lower()
-            print(f"User said: {query}")
-
-            if "create new folder" in query:
-                folder_name = query.replace("create new folder", "").strip()
-                if not folder_name:
-                    folder_name = "New Folder"
-                success, message = create_folder(folder_name)
-                if success:
-                    print(f"Folder '{folder_name}' created successfully.")
-                    print(f"Folder path: {message}")
-                    speak("New folder created.")
-                else:
-                    print(message)
-                    speak(message)
-            elif "sleep pc" in query:
-                sleep_pc()
-                speak("Going to sleep.")
-            elif "lock pc" in query:
-                lock_pc()
-                speak("Locking the PC.")
-            elif "open" in query:
-                application_name = query.replace("open", "").strip()
-                open_application(application_name)
-            elif "close tabs" in query:
-                try:
-                    tabs_to_close = query.split("close tabs")[1].strip()
-                    close_tabs(tabs_to_close)
-                except IndexError:
-                    speak("How many tabs do you want to close?")
-                except Exception as e:
-                    speak(f"An error occurred: {e}")
-            else:
-                print("Command not recognized.")
-                speak("Command not recognized.")
-
-        except sr.UnknownValueError:
-            print("Could not understand audio.")
-            speak("Could not understand audio.")
-        except sr.RequestError as e:
-            print(f"Could not request results; {e}")
-            speak(f"Could not request results; {e}")
-        except sr.WaitTimeoutError:
-            print("Listening timed out. Listening again.")
-            speak("Listening timed out. Listening again.")
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            speak(f"An unexpected error occurred: {e}")
+    # One microphone stream for the whole session, calibrated once when it opens. It keeps
+    # listening while the assistant talks; the gate drops what is mostly the assistant's own voice.
+    capture = AudioCapture(streamer=backend)
+
+    # Capture, recognition, routing and execution each run on their own thread, so the next
+    # command is heard and recognized while the current one is still executing
+    report_error = lambda e: speak(f"An unexpected error occurred: {e}")
+    # Sounds that are not speech aimed at the assistant are dropped before recognition
+    gate = create_gate()
+    pipeline = Pipeline(capture.segments, tracer=get_tracer())
+    pipeline.add_stage("gate", gate.accept, on_error=report_error)
+    pipeline.add_stage("recognize", lambda audio: recognize_query(backend, audio, gate), on_error=report_error)
+    pipeline.add_stage("route", plan_query, on_error=report_error)
+    pipeline.add_stage("execute", execute_action, on_error=report_error)
+    pipeline.start()
+
+    capture.start()
+    startup_timer.mark("listening")
+    print("Listening...")
+    print(startup_timer.report())
+    speak("Listening...")
 
-        time.sleep(1)
+    # The execute stage produces nothing; this returns once the pipeline is closed
+    while pipeline.output.get() is not None:
+        pass
 
 if __name__ == "__main__":
     voice_assistant()
\ No newline at end of file
@@ -0,0 +1,124 @@
+from startup import get_startup_timer
+startup_timer = get_startup_timer()
+import re
+import threading
+import browser_automation as browser
+import OS_Automation as os_automation
+from router import Router
+
+# Alfred as one long-running daemon: a single microphone stream and recognizer feed one
+# router, which hands OS commands to OS_Automation and everything else to the browser.
+
+# Utterances that stop the daemon itself
+SHUTDOWN_COMMANDS = {"goodbye alfred", "shut down alfred", "stop listening"}
+
+# The browser driver, or None until a browser command arrives
+driver = None
+driver_lock = threading.Lock()
+
+# Function to return the browser driver, starting the browser on first use
+def get_driver():
+    global driver
+    with driver_lock:
+        if driver is None:
+            driver = browser.start_browser()
+        return driver
+
+# Function to run a browser command
+def run_browser_command(command, count):
+    result = browser.dispatch_command(get_driver(), command, count)
+    # Keeps the tab pool bounded, closing the least recently used tabs
+    browser.tab_manager.touch(driver)
+    return result
+
+# Function to close tabs through the browser session when there is one, or with keyboard shortcuts otherwise
+def close_tabs(command, count):
+    if driver is None:
+        if command["target"].isdigit():
+            return os_automation.close_tabs(command["target"])
+        browser.speak("The browser is not open.")
+        return False
+    return run_browser_command(command, count)
+
+# Function to close the browser if it was started; the daemon keeps listening
+def close_browser(command, count):
+    global driver
+    with driver_lock:
+        if driver is None:
+            browser.speak("The browser is not open.")
+            return False
+        browser.close_browser(driver)
+        driver = None
+    browser.speak("Browser closed.")
+    return True
+
+# One dispatch table for every intent the daemon understands
+router = os_automation.register_os_handlers(Router(fallback=run_browser_command))
+for intent in browser.INTENTS:
+    router.register(intent, run_browser_command)
+# "exit" closes the browser; the browser is started again by the next browser command
+router.register("exit", close_browser)
+router.register("close_tabs", close_tabs)
+
+# Function to parse a recognized utterance: OS commands locally, anything else as a browser command
+def parse_utterance(text):
+    # Only the words are compared; normalize_command would drop "alfred" as a filler word
+    if " ".join(re.findall(r"[a-z0-9']+", text.lower())) in SHUTDOWN_COMMANDS:
+        return {"intent": "shutdown", "target": "", "parameters": {}}
+    command = os_automation.parse_os_command(text)
+    # "open youtube" is a website, "open notepad" an application
+    if command is not None and (command["intent"] != "open_application"
+                                or os_automation.is_known_application(command["target"])):
+        acknowledgement = router.route(command).acknowledgement
+        if acknowledgement:
+            browser.speak(acknowledgement)
+        return command
+    return browser.parse_utterance(text)
+
+# Main function: listen once, route every command, run it
+def alfred():
+    # Gemini and the speech engine warm up in the background, ready for the first command
+    startup_timer.warm("init.gemini", browser.get_gemini)
+    startup_timer.warm("init.speech_engine", browser.speech_worker.get_speech_worker)
+    os_automation.file_index.start()
+
+    pipeline = browser.start_command_pipeline(parse=parse_utterance)
+    browser.speak("Alfred is listening.")
+    print(startup_timer.report())
+
+    tracer = browser.tracer
+    while True:
+        # Block until the next parsed command, so the idle loop does not wake up
+        command = pipeline.output.get()
+        if command is None:
+            break
+        parsed_command = command.value
+        intent = parsed_command.get("intent", "unknown")
+        trace = command.context
+        tracer.add_span(trace, "queue.parse", command.age())
+        print(f"Parsed command: {parsed_command} (x{command.count})")
+
+        if intent == "shutdown":
+            browser.speak("Goodbye.", wait=True)
+            if driver is not None:
+                browser.close_browser(driver)
+            print(f"Application stats: {os_automation.app_registry.stats()}")
+            print(f"File index stats: {os_automation.file_index.stats()}")
+            print(f"Speech gate stats: {browser.speech_gate.stats()}")
+            print(f"Pipeline stats: {pipeline.stats()}")
+            print(tracer.report())
+            tracer.write_summary()
+            pipeline.close()
+            break
+
+        with tracer.use(trace):
+            with tracer.span("dispatch", intent=intent):
+                try:
+                    router.dispatch(parsed_command, command.count)
+                except Exception as e:
+                    print(f"Error running {intent}: {e}")
+                    browser.speak(f"An unexpected error occurred: {e}")
+            tracer.finish(trace, intent)
+
+if __name__ == "__main__":
+    alfred()
@@ -0,0 +1,198 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from fuzzy_match import token_set_similarity
+
+# Looked up once; every launch used to call platform.system() again
+SYSTEM = platform.system()
+
+
+@lru_cache(maxsize=None)
+def which(program):
+    """Returns the full path of program, looked up on PATH once per program, or None."""
+    if os.path.isabs(program):
+        return program if os.path.isfile(program) else None
+    return shutil.which(program)
+
+
+def default_registry_path():
+    """Returns APPLICATIONS_PATH, or the applications.json next to this module."""
+    return os.getenv("APPLICATIONS_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "applications.json")
+
+
+def default_threshold():
+    return float(os.getenv("APP_MATCH_THRESHOLD", "0.7"))
+
+
+def find_window(title):
+    """Tells whether a window whose title contains title is open; False when that cannot be checked."""
+    try:
+        if SYSTEM == "Windows":
+            # pygetwindow is installed with pyautogui
+            import pygetwindow
+            return bool(pygetwindow.getWindowsWithTitle(title))
+        if SYSTEM == "Linux":
+            wmctrl = which("wmctrl")
+            if wmctrl is None:
+                return False
+            listing = subprocess.run([wmctrl, "-l"], capture_output=True, text=True, timeout=2).stdout
+            return title.lower() in listing.lower()
+        if SYSTEM == "Darwin":
+            script = f'application "{title}" is running'
+            return subprocess.run(["osascript", "-e", script], capture_output=True, text=True, timeout=2).stdout.strip() == "true"
+    except Exception as e:
+        print(f"Could not look for the {title} window: {e}")
+    return False
+
+
+def focus_window(title):
+    """Brings the window whose title contains title to the front; returns whether it did."""
+    try:
+        if SYSTEM == "Windows":
+            import pygetwindow
+            windows = pygetwindow.getWindowsWithTitle(title)
+            if not windows:
+                return False
+            if windows[0].isMinimized:
+                windows[0].restore()
+            windows[0].activate()
+            return True
+        if SYSTEM == "Linux":
+            wmctrl = which("wmctrl")
+            return wmctrl is not None and subprocess.run([wmctrl, "-a", title], timeout=2).returncode == 0
+        if SYSTEM == "Darwin":
+            script = f'tell application "{title}" to activate'
+            return subprocess.run(["osascript", "-e", script], timeout=2).returncode == 0
+    except Exception as e:
+        print(f"Could not focus the {title} window: {e}")
+    return False
+
+
+class Application:
+    """One entry of the registry, with its launcher resolved for this platform.
+
+    command is the first launch candidate whose program exists here, with its path looked
+    up, or None when the application cannot be started on this platform.
+    """
+
+    def __init__(self, name, aliases=(), launch=None, window=None, unsupported=None):
+        self.name = name
+        self.aliases = list(aliases)
+        self.window = (window or {}).get(SYSTEM)
+        self.unsupported = unsupported or f"{name} is not available on this computer."
+        self.command = self._resolve((launch or {}).get(SYSTEM, []))
+        self.process = None
+
+    @staticmethod
+    def _resolve(candidates):
+        for candidate in candidates:
+            program = which(candidate[0])
+            if program is not None:
+                return [program] + [os.path.expanduser(argument) for argument in candidate[1:]]
+        return None
+
+    def running(self):
+        """Tells whether the process this registry last launched is still running."""
+        return self.process is not None and self.process.poll() is None
+
+    def __repr__(self):
+        return f"Application({self.name!r})"
+
+
+class AppRegistry:
+    """Applications that can be opened by voice, loaded once from a JSON file.
+
+    Spoken names are matched against names and aliases exactly, then fuzzily. Opening an
+    application that already has a window focuses it instead of starting another one, and
+    the time from launch until its window appears is kept per application.
+    """
+
+    def __init__(self, path=None, window_timeout=20):
+        self.path = default_registry_path() if path is None else path
+        self.window_timeout = window_timeout
+        self.applications = {}
+        self._names = {}
+        # Names without spaces, since recognizers split and join words freely ("note pad", "vscode")
+        self._compact = {}
+        self._launches = defaultdict(int)
+        self._focuses = defaultdict(int)
+        self._window_times = defaultdict(lambda: deque(maxlen=20))
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load applications from {self.path}: {e}")
+            entries = {}
+        for name, entry in entries.items():
+            self.add(Application(name, **entry))
+
+    def add(self, application):
+        self.applications[application.name] = application
+        for name in [application.name] + application.aliases:
+            self._names[name.lower()] = application
+            self._compact[name.lower().replace(" ", "")] = application
+
+    def find(self, spoken_name, threshold=None):
+        """Returns the Application a spoken name refers to, or None."""
+        spoken_name = (spoken_name or "").lower().strip()
+        if spoken_name in self._names:
+            return self._names[spoken_name]
+        if spoken_name.replace(" ", "") in self._compact:
+            return self._compact[spoken_name.replace(" ", "")]
+        threshold = default_threshold() if threshold is None else threshold
+        best, best_score = None, threshold
+        for name, application in self._names.items():
+            score = token_set_similarity(spoken_name, name)
+            if score >= best_score and (best is None or score > best_score):
+                best, best_score = application, score
+        return best
+
+    def open(self, application):
+        """Focuses or launches an application; returns "focused", "launched" or "unavailable"."""
+        if application.command is None:
+            return "unavailable"
+        if application.window and (application.running() or find_window(application.window)) \
+                and focus_window(application.window):
+            with self._lock:
+                self._focuses[application.name] += 1
+            return "focused"
+        started = time.perf_counter()
+        application.process = subprocess.Popen(application.command)
+        with self._lock:
+            self._launches[application.name] += 1
+        if application.window:
+            threading.Thread(target=self._time_window, args=(application, started),
+                             name=f"window-{application.name}", daemon=True).start()
+        return "launched"
+
+    def _time_window(self, application, started):
+        while time.perf_counter() - started < self.window_timeout:
+            if find_window(application.window):
+                seconds = time.perf_counter() - started
+                with self._lock:
+                    self._window_times[application.name].append(seconds)
+                print(f"{application.name} window appeared after {seconds * 1000:.0f} ms")
+                return
+            time.sleep(0.1)
+
+    def stats(self):
+        """Returns {name: {"launches", "focuses", "window_p50_ms", "window_max_ms"}} for opened applications."""
+        with self._lock:
+            result = {}
+            for name in set(self._launches) | set(self._focuses):
+                times = sorted(self._window_times.get(name, ()))
+                result[name] = {
+                    "launches": self._launches[name],
+                    "focuses": self._focuses[name],
+                    "window_p50_ms": round(times[len(times) // 2] * 1000) if times else None,
+                    "window_max_ms": round(times[-1] * 1000) if times else None,
+                }
+            return result
@@ -0,0 +1,165 @@
+import array
+import collections
+import math
+import threading
+import time
+
+import speech_recognition as sr
+
+from command_queue import CommandQueue, DROP_OLDEST
+
+try:
+    import audioop
+except ImportError:  # removed from the standard library in Python 3.13
+    audioop = None
+
+
+def chunk_energy(data, sample_width):
+    """Returns the RMS energy of a chunk of little-endian PCM audio."""
+    if audioop is not None:
+        return audioop.rms(data, sample_width)
+    samples = array.array("h", data) if sample_width == 2 else array.array("b", data)
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(s * s for s in samples) / len(samples)))
+
+
+class AudioCapture:
+    """Keeps one microphone stream open and cuts it into utterances.
+
+    The noise floor is calibrated once when the stream opens and then recalibrated in the
+    background from quiet chunks. Chunks louder than the threshold start an utterance, which
+    includes pre_roll seconds of audio from before it started so first syllables are kept,
+    and ends after pause seconds of quiet. Finished utterances are put on self.segments as
+    sr.AudioData, with started_at and ended_at (time.monotonic() seconds), speech_started_at
+    and speech_ended_at (the first and last loud chunk, without the pre-roll and the closing
+    pause) and the energy_threshold it was cut with.
+
+    With a streamer (a recognizer backend that supports streaming), audio is also fed to it
+    while the user talks: on_partial gets each new partial hypothesis, and the final text is
+    attached to the segment as streamed_text.
+    """
+
+    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024, pre_roll=0.4, pause=0.8,
+                 min_speech=0.25, max_segment=15, energy_ratio=1.5, recalibrate_interval=30,
+                 streamer=None, on_partial=None):
+        self.device_index = device_index
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.pre_roll = pre_roll
+        self.pause = pause
+        self.min_speech = min_speech
+        self.max_segment = max_segment
+        self.energy_ratio = energy_ratio
+        self.recalibrate_interval = recalibrate_interval
+        self.streamer = streamer
+        self.on_partial = on_partial
+        self.energy_threshold = 300
+        self.segments = CommandQueue(maxsize=8, policy=DROP_OLDEST, name="audio segment")
+        self.segment_count = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Opens the microphone on a background thread."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Closes the microphone and wakes anyone waiting on segments."""
+        self._running = False
+        self.segments.close()
+
+    def _run(self):
+        while self._running:
+            try:
+                with sr.Microphone(device_index=self.device_index, sample_rate=self.sample_rate,
+                                   chunk_size=self.chunk_size) as source:
+                    self._capture(source)
+            except Exception as e:
+                print(f"Microphone error, reopening: {e}")
+                time.sleep(1)
+
+    def _read(self, source):
+        data = source.stream.read(source.CHUNK)
+        return data, chunk_energy(data, source.SAMPLE_WIDTH)
+
+    def _calibrate(self, source, seconds_per_chunk, duration=1.0):
+        energies = [self._read(source)[1] for _ in range(max(1, int(duration / seconds_per_chunk)))]
+        self._set_threshold(energies)
+
+    def _set_threshold(self, energies):
+        ordered = sorted(energies)
+        ambient = ordered[len(ordered) // 2]
+        self.energy_threshold = max(ambient * self.energy_ratio, 50)
+
+    def _capture(self, source):
+        seconds_per_chunk = source.CHUNK / source.SAMPLE_RATE
+        self._calibrate(source, seconds_per_chunk)
+        print(f"Microphone calibrated, energy threshold {self.energy_threshold:.0f}")
+
+        pre_roll = collections.deque(maxlen=max(1, int(self.pre_roll / seconds_per_chunk)))
+        quiet = collections.deque(maxlen=max(1, int(5 / seconds_per_chunk)))
+        last_calibration = time.monotonic()
+        frames = None
+        session = None
+        partial = None
+        speech_chunks = 0
+        silent_chunks = 0
+
+        while self._running:
+            data, energy = self._read(source)
+            loud = energy > self.energy_threshold
+
+            if frames is None:
+                if loud:
+                    frames = list(pre_roll)
+                    frames.append(data)
+                    started_at = time.monotonic() - len(frames) * seconds_per_chunk
+                    speech_started_at = speech_ended_at = time.monotonic()
+                    speech_chunks, silent_chunks = 1, 0
+                    if self.streamer is not None:
+                        session = self.streamer.start_stream(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+                        partial = None
+                        if session is not None:
+                            for frame in frames:
+                                session.feed(frame)
+                else:
+                    pre_roll.append(data)
+                    quiet.append(energy)
+                    if time.monotonic() - last_calibration > self.recalibrate_interval and len(quiet) == quiet.maxlen:
+                        self._set_threshold(quiet)
+                        last_calibration = time.monotonic()
+                continue
+
+            frames.append(data)
+            if session is not None:
+                hypothesis = session.feed(data)
+                if hypothesis and hypothesis != partial:
+                    partial = hypothesis
+                    if self.on_partial:
+                        self.on_partial(partial)
+            if loud:
+                speech_chunks += 1
+                silent_chunks = 0
+                speech_ended_at = time.monotonic()
+            else:
+                silent_chunks += 1
+            if silent_chunks * seconds_per_chunk < self.pause and len(frames) * seconds_per_chunk < self.max_segment:
+                continue
+
+            if speech_chunks * seconds_per_chunk >= self.min_speech:
+                self.segment_count += 1
+                audio = sr.AudioData(b"".join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+                audio.started_at, audio.ended_at = started_at, time.monotonic()
+                audio.speech_started_at, audio.speech_ended_at = speech_started_at - seconds_per_chunk, speech_ended_at
+                audio.energy_threshold = self.energy_threshold
+                if session is not None:
+                    audio.streamed_text = session.finish()
+                self.segments.put(audio)
+            pre_roll.clear()
+            frames = None
+            session = None
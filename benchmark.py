@@ -0,0 +1,336 @@
+"""Offline replay benchmark for the browser assistant.
+
+Replays a corpus of typed commands through process_with_gemini and dispatch_command, the
+same parse and dispatch path voice_controlled_browser uses, with:
+
+* a deterministic local stand-in for the Gemini model,
+* a local HTTP server that serves the Google/Bing/YouTube-like pages in bench_fixtures,
+* a headless Edge or Chrome, or a fake driver that only counts calls.
+
+Run `python benchmark.py --driver headless-edge` (or headless-chrome, or fake) and compare
+runs with --json out.json --compare previous.json.
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from gemini_client import GeminiClient
+from intent_cache import IntentCache
+from site_adapters import SelectorCache
+from intent_parser import parse_command, parse_plan
+from tracing import Tracer, TracedDriver
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+
+# Handlers whose WebDriver call counts are reported
+COUNTED_HANDLERS = ["perform_search", "click_element_with_text", "click_numbered_result"]
+
+
+class FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves /<host>/<anything> with bench_fixtures/<host>.html, or example.com.html for unknown hosts."""
+
+    def do_GET(self):
+        host = self.path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+        path = os.path.join(FIXTURE_DIR, f"{host}.html")
+        if not os.path.exists(path):
+            path = os.path.join(FIXTURE_DIR, "example.com.html")
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server():
+    """Starts the fixture server on a free local port and returns its base URL."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class FixtureDriver:
+    """Wraps a driver so navigation to any https site goes to the fixture server instead.
+
+    https://www.google.com/search?q=x becomes <base>/google.com/search?q=x, and
+    current_url maps it back, so site adapters still see the original domain.
+    """
+
+    def __init__(self, driver, base_url):
+        self._driver = driver
+        self._base_url = base_url
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    @property
+    def current_url(self):
+        url = self._driver.current_url
+        if url.startswith(self._base_url + "/"):
+            return "https://" + url[len(self._base_url) + 1:]
+        return url
+
+    def get(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme in ("http", "https") and not url.startswith(self._base_url):
+            host = parsed.netloc[4:] if parsed.netloc.startswith("www.") else parsed.netloc
+            url = f"{self._base_url}/{host}{parsed.path or '/'}" + (f"?{parsed.query}" if parsed.query else "")
+        return self._driver.get(url)
+
+
+class FakeDriver:
+    """Stands in for a browser without running any page script; only the calls are real.
+
+    Useful for measuring the Python-side cost and call counts of each handler on machines
+    without a browser. Every lookup comes back empty, so clicks and searches take their
+    not-found paths.
+    """
+
+    def __init__(self):
+        self.current_url = "about:blank"
+        self._history = []
+
+    def get(self, url):
+        self._history.append(url)
+        self.current_url = url
+
+    def back(self):
+        if len(self._history) > 1:
+            self._history.pop()
+            self.current_url = self._history[-1]
+
+    def forward(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def execute_script(self, script, *args):
+        last_line = script.strip().splitlines()[-1]
+        if "document.readyState" in last_line:
+            return "complete"
+        if "index.snapshot" in last_line:
+            return {"token": "fake", "version": 1, "entries": []}
+        if "index.resolve" in last_line:
+            return []
+        return None
+
+    def find_element(self, by, value):
+        from selenium.common.exceptions import NoSuchElementException
+        raise NoSuchElementException(f"{by}={value}")
+
+    def find_elements(self, by, value):
+        return []
+
+    def quit(self):
+        pass
+
+
+class StandInUsage:
+    """Token counts estimated at four characters per token."""
+
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class StandInResponse:
+    def __init__(self, text, prompt=""):
+        self.text = text
+        self.usage_metadata = StandInUsage(prompt, text)
+
+
+class StandInModel:
+    """Deterministic replacement for the Gemini model with a fixed simulated latency and failure rate."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(0)
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("simulated Gemini failure")
+        command = (prompt if isinstance(prompt, str) else str(prompt)).strip().lower()
+        result = parse_plan(command) or parse_command(command)
+        if result is None:
+            show = re.match(r"(?:show me|take me to|go to) (?:the )?(.+?)(?: page)?$", command)
+            if show:
+                result = {"intent": "click", "target": show.group(1), "parameters": {}}
+            else:
+                result = {"intent": "unknown", "target": None, "parameters": {}}
+        # Reply in the shape of browser_automation.INTENT_SCHEMA
+        steps = [{"intent": step["intent"], "target": step["target"]} for step in result["parameters"].get("steps", [])]
+        result = {"intent": result["intent"], "target": result["target"], **({"steps": steps} if steps else {})}
+        return StandInResponse(json.dumps(result), command)
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def create_driver(kind):
+    if kind == "fake":
+        return FakeDriver()
+    from selenium import webdriver
+    if kind == "headless-edge":
+        options = webdriver.EdgeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,1024")
+        driver_path = os.getenv("EDGE_WEBDRIVER_PATH")
+        if driver_path:
+            from selenium.webdriver.edge.service import Service
+            return webdriver.Edge(service=Service(executable_path=driver_path), options=options)
+        return webdriver.Edge(options=options)
+    if kind == "headless-chrome":
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,1024")
+        return webdriver.Chrome(options=options)
+    raise ValueError(f"Unknown driver {kind}")
+
+
+def run(corpus, driver_kind="fake", gemini_latency=0.0, repeat=1, gemini_failures=0.0):
+    """Replays the corpus and returns the benchmark results as a dict."""
+    import browser_automation
+
+    tracer = Tracer(slow_threshold=float("inf"))
+    browser_automation.tracer = tracer
+    browser_automation.model = StandInModel(gemini_latency, gemini_failures)
+    browser_automation.gemini = GeminiClient(browser_automation.model)
+    browser_automation.intent_cache = IntentCache(path="")
+    browser_automation.selector_cache = SelectorCache(path="")
+    browser_automation.speak = lambda text, wait=False: None
+
+    # Count the driver calls made inside each handler of interest
+    calls = defaultdict(list)
+    traced_driver = None
+
+    def counted(name, function):
+        @functools.wraps(function)
+        def wrapper(driver, *args, **kwargs):
+            before = traced_driver.call_count
+            try:
+                return function(driver, *args, **kwargs)
+            finally:
+                calls[name].append(traced_driver.call_count - before)
+        return wrapper
+
+    originals = {name: getattr(browser_automation, name) for name in COUNTED_HANDLERS}
+    for name, function in originals.items():
+        setattr(browser_automation, name, counted(name, function))
+
+    driver = create_driver(driver_kind)
+    if driver_kind != "fake":
+        driver = FixtureDriver(driver, start_fixture_server())
+    traced_driver = TracedDriver(driver, tracer)
+    outcomes = defaultdict(lambda: [0, 0])
+    started = time.perf_counter()
+    try:
+        traced_driver.get("about:blank")
+        for _ in range(repeat):
+            for text in corpus:
+                trace = tracer.start(text)
+                with tracer.use(trace):
+                    with tracer.span("parse"):
+                        parsed_command = browser_automation.process_with_gemini(text)
+                    intent = parsed_command.get("intent", "unknown")
+                    with tracer.span("dispatch", intent=intent):
+                        try:
+                            ok = browser_automation.dispatch_command(traced_driver, parsed_command)
+                        except Exception as e:
+                            print(f"{text!r} raised {e}")
+                            ok = False
+                    tracer.finish(trace, intent)
+                outcomes[intent][0 if ok else 1] += 1
+    finally:
+        elapsed = time.perf_counter() - started
+        for name, function in originals.items():
+            setattr(browser_automation, name, function)
+        traced_driver.quit()
+
+    commands = len(corpus) * repeat
+    summary = tracer.summary()
+    return {
+        "driver": driver_kind,
+        "commands": commands,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(commands / elapsed, 2) if elapsed else None,
+        "gemini_calls": browser_automation.model.calls,
+        "gemini_client": browser_automation.gemini.stats(),
+        "selector_cache": browser_automation.selector_cache.stats(),
+        "webdriver_calls": traced_driver.call_count,
+        "intents": {intent: {"ok": ok, "failed": failed, **summary.get(intent, {}).get("total", {})}
+                    for intent, (ok, failed) in outcomes.items()},
+        "handler_calls": {name: {"runs": len(counts), "total": sum(counts), "max": max(counts, default=0)}
+                          for name, counts in calls.items()},
+    }
+
+
+def print_results(results, previous=None):
+    def delta(new, old):
+        if old in (None, 0) or new is None:
+            return ""
+        return f" ({(new - old) / old:+.0%})"
+
+    prev = previous or {}
+    print(f"Driver: {results['driver']}, {results['commands']} commands in {results['elapsed']} s")
+    print(f"Throughput: {results['throughput']} commands/s{delta(results['throughput'], prev.get('throughput'))}")
+    print(f"Gemini calls: {results['gemini_calls']}, WebDriver calls: {results['webdriver_calls']}"
+          f"{delta(results['webdriver_calls'], prev.get('webdriver_calls'))}")
+    print(f"Gemini client: {results['gemini_client']}")
+    print(f"\n{'intent':<14}{'ok':>4}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for intent, stats in sorted(results["intents"].items()):
+        old = prev.get("intents", {}).get(intent, {})
+        p50 = stats.get("p50", 0) * 1000
+        p95 = stats.get("p95", 0) * 1000
+        print(f"{intent:<14}{stats['ok']:>4}{stats['failed']:>6}{p50:>10.1f}{p95:>10.1f}"
+              f"{delta(stats.get('p95'), old.get('p95'))}")
+    print(f"\n{'handler':<26}{'runs':>6}{'calls':>8}{'max':>6}")
+    for name, stats in sorted(results["handler_calls"].items()):
+        old = prev.get("handler_calls", {}).get(name, {})
+        print(f"{name:<26}{stats['runs']:>6}{stats['total']:>8}{stats['max']:>6}{delta(stats['total'], old.get('total'))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a command corpus through the browser assistant offline.")
+    parser.add_argument("--corpus", default=os.path.join(FIXTURE_DIR, "commands.txt"))
+    parser.add_argument("--driver", default="fake", choices=["fake", "headless-edge", "headless-chrome"])
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="simulated seconds per Gemini call")
+    parser.add_argument("--gemini-failures", type=float, default=0.0, help="fraction of simulated Gemini calls that fail")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run(load_corpus(args.corpus), args.driver, args.gemini_latency, args.repeat, args.gemini_failures)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,156 +1,297 @@
-import speech_recognition as sr
-import pyttsx3
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from startup import get_startup_timer
+startup_timer = get_startup_timer()
+# selenium.webdriver and google.generativeai are imported on first use; the speech stack is needed right away
+with startup_timer.timed("import.speech"):
+    import speech_recognition as sr
+    import speech_worker
+    from audio_capture import AudioCapture
+    from speech_gate import create_gate
+    from recognizers import create_backend, recognize_segment
 import time
 import threading
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import re
 import json
-from selenium.common.exceptions import ElementNotInteractableException, StaleElementReferenceException, TimeoutException, NoSuchElementException
+from selenium.common.exceptions import ElementNotInteractableException, StaleElementReferenceException, TimeoutException, NoSuchElementException, WebDriverException
+from intent_cache import IntentCache, normalize_command
+from intent_parser import parse_local, plan_result, fallback_parse, normalize_scroll_target
+from gemini_client import create_client, CircuitOpenError
+from page_index import PageIndex
+import fuzzy_match
+from search_box import find_search_box, GENERIC_SEARCH_SELECTORS
+from site_adapters import adapter_for, domain_of, SelectorCache
+from command_queue import DROP_OLDEST
+from pipeline import Pipeline
+from concurrent.futures import ThreadPoolExecutor
+from tracing import get_tracer, TracedDriver
+from browser_session import create_session
+from tab_manager import create_tab_manager
+from fast_navigation import NavigationTimer
 
 load_dotenv()
-# Initialize the speech recognizer and text-to-speech engine
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-command_received = None
+# Speech recognition backend (ASR_BACKEND), created when listening starts; speech output goes through the shared speech worker
+asr_backend = None
+
+# Recognition, parsing and execution run as a pipeline (started in voice_controlled_browser)
+command_pipeline = None
+
+# On-device gate in front of recognition: voice activity, wake phrase and our own speech (ALFRED_VAD, ALFRED_WAKE_*)
+speech_gate = None
+
+# Utterances that cancel everything still waiting to run
+CANCEL_COMMANDS = {"stop", "cancel", "never mind", "nevermind", "cancel that"}
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("API_KEY")  # Replace with your actual API key
-genai.configure(api_key=GEMINI_API_KEY)
 
-# Initialize Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Instructions sent once as the model's system instruction instead of with every command
+SYSTEM_INSTRUCTION = """You parse commands for a voice-controlled browser into JSON.
+- open_website: target is the domain, e.g. "open YouTube" -> "youtube.com".
+- search: target is the search query.
+- scroll: target is "down", "up", "top" or "bottom".
+- navigate: target is "back", "forward" or "refresh".
+- click: target is the text or description of what to click, e.g. "the first video" or "sign in". Use click for "open the link about X", "select X" or "choose X".
+- list: target is "links", for requests to list links or clickable elements, or "tabs" to list the open tabs.
+- close_tabs: target is how many tabs to close, e.g. "3", "all", or the domain whose tabs to close, e.g. "youtube.com".
+- switch_tab: target is the site or title of the tab to switch to.
+- exit: the user wants to close the browser.
+- plan: the command asks for several actions in order, e.g. "open youtube, search lo-fi music and play the first video". Put each action in steps, in order, and leave target empty.
+- unknown: anything else."""
 
-# Function to speak text
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
+INTENTS = ["open_website", "search", "scroll", "navigate", "click", "list", "close_tabs", "switch_tab", "exit", "plan", "unknown"]
 
-# Function to listen for voice commands in a separate thread
-def listen_thread():
-    global command_received
-    while True:
-        with sr.Microphone() as source:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print(f"You said: {command}")
-                command_received = command.lower()
-            except sr.UnknownValueError:
-                print("Sorry, I did not understand that.")
-            except sr.RequestError:
-                print("Could not request results from Google Speech Recognition service.")
-        time.sleep(0.1)  # Small pause to prevent CPU overuse
+# Replies are constrained to this schema, so they always parse as JSON with a known intent
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "format": "enum", "enum": INTENTS},
+        "target": {"type": "string", "nullable": True},
+        "steps": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "intent": {"type": "string", "format": "enum", "enum": [i for i in INTENTS if i != "plan"]},
+                    "target": {"type": "string", "nullable": True},
+                },
+                "required": ["intent"],
+            },
+        },
+    },
+    "required": ["intent"],
+}
+
+# Gemini model and client, built on first use or warmed up in the background at startup.
+# Calls go through a client with deadlines, retries and a circuit breaker (GEMINI_* settings)
+model = None
+gemini = None
+gemini_lock = threading.Lock()
+
+# Function to return the Gemini client, importing and configuring the API on first use
+def get_gemini():
+    global model, gemini
+    with gemini_lock:
+        if gemini is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GEMINI_API_KEY)
+            model = genai.GenerativeModel(
+                'gemini-2.0-flash',
+                system_instruction=SYSTEM_INSTRUCTION,
+                generation_config={"response_mime_type": "application/json", "response_schema": INTENT_SCHEMA},
+            )
+            gemini = create_client(model)
+        return gemini
+
+# Cache of parsed commands so repeated utterances skip the Gemini round trip
+intent_cache = IntentCache(
+    max_memory_entries=int(os.getenv("INTENT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("INTENT_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# Default scroll amount in pixels (can be adjusted based on user preference)
+SCROLL_AMOUNT = 300
+
+# Seconds to wait for a search box to appear before searching on Bing instead
+SEARCH_BOX_TIMEOUT = 1.5
+
+# Selectors that worked on each site, tried first next time (SELECTOR_CACHE_PATH)
+selector_cache = SelectorCache()
+
+# Navigation-to-interactive times of opened pages, per site
+navigation_timer = NavigationTimer()
+
+# Browser session with the persistent profile and warm tabs (started in voice_controlled_browser)
+browser_session = None
+
+# Open tabs, closed and switched by window handle (created with the browser session)
+tab_manager = None
+
+# Index of the clickable elements on the current page, shared by the click and list commands
+page_index = PageIndex()
+
+# Per-command latency tracing (see tracing.py for the export settings)
+tracer = get_tracer()
+
+# Function to speak text without blocking the browser loop
+def speak(text, wait=False):
+    # Playback time is recorded on the command being handled, once the phrase finishes
+    trace = tracer.current()
+    tracer.expect(trace)
+    on_done = lambda started, finished, spoken: tracer.fulfil(trace, "tts", finished - started, started, text=text, spoken=spoken)
+    speech_worker.speak(text, wait=wait, on_done=on_done if trace else None)
+
+# Function to drop captured sounds that are not speech aimed at the assistant before they reach the recognizer
+def gate_segment(audio):
+    if speech_gate.accept(audio) is None:
+        tracer.finish(tracer.current(), "gated")
+        return None
+    return audio
+
+# Function to recognize one captured utterance; runs on the pipeline's recognition thread
+def recognize_utterance(audio):
+    trace = tracer.current()
+    tracer.add_span(trace, "capture", len(audio.frame_data) / (audio.sample_rate * audio.sample_width))
+    try:
+        command = recognize_segment(asr_backend, audio)
+    except sr.UnknownValueError:
+        print("Sorry, I did not understand that.")
+        return None
+    except sr.RequestError:
+        print("Could not request results from Google Speech Recognition service.")
+        return None
+    print(f"You said: {command}")
+    command = speech_gate.accept_text(command, audio)
+    if not command:
+        # The wake phrase on its own opens the wake window for the next command
+        if command == "":
+            speak("Yes?")
+        tracer.finish(trace, "gated")
+        return None
+    trace.text = command
+    # A new command cuts off whatever is still being said (barge-in)
+    speech_worker.interrupt_speech()
+    if normalize_command(command) in CANCEL_COMMANDS:
+        cancelled = command_pipeline.cancel_pending()
+        print(f"Cancelled {cancelled} pending commands")
+        tracer.finish(trace, "cancel")
+        return None
+    # Kept as recognized, so search queries and click targets keep their case
+    return command
+
+# Gemini parses started from partial hypotheses while the user is still talking, keyed by normalized text
+speculative_parses = {}
+speculative_lock = threading.Lock()
+speculation_pool = ThreadPoolExecutor(max_workers=1)
+last_partial = None
+
+# Function to start parsing a partial hypothesis once it has been stable for two updates
+def prefetch_partial(text):
+    global last_partial
+    key = normalize_command(text)
+    stable = key == last_partial
+    last_partial = key
+    if not stable or not key or parse_local(text) is not None:
+        return
+    with speculative_lock:
+        if key not in speculative_parses:
+            print(f"Parsing partial hypothesis early: {text}")
+            speculative_parses[key] = speculation_pool.submit(process_with_gemini, text)
+
+# Function to parse a recognized utterance; runs on the pipeline's parsing thread while the browser is busy
+def parse_utterance(command):
+    # Reuse the early parse if the final text matches a partial hypothesis
+    with speculative_lock:
+        speculative = speculative_parses.pop(normalize_command(command), None)
+        speculative_parses.clear()
+    if speculative is not None:
+        print("Using the early parse of the partial hypothesis")
+        return speculative.result()
+    return process_with_gemini(command)
+
+# Function returning a key under which repeats of a parsed command are merged into one action with a count
+def coalescing_key(parsed_command):
+    if parsed_command.get("intent") in ("scroll", "navigate") and parsed_command.get("target") in ("down", "up", "refresh"):
+        return (parsed_command["intent"], parsed_command["target"])
+    return None
+
+# Function to start capture, recognition and parsing, each on its own thread; parse turns text into a command
+def start_command_pipeline(parse=parse_utterance):
+    global command_pipeline, asr_backend, speech_gate
+    with startup_timer.timed("init.asr_backend"):
+        asr_backend = create_backend()
+    # The stream stays open and calibrated, and keeps listening while we talk so a new command can cut us off;
+    # the speech gate drops segments that are mostly our own voice coming back
+    capture = AudioCapture(streamer=asr_backend, on_partial=prefetch_partial)
+    speech_gate = create_gate()
+    # Parsed commands left waiting more than 15 s are dropped as stale. Recognized text is
+    # never dropped: a full queue holds up recognition, and the audio waiting before it backs up
+    command_pipeline = Pipeline(capture.segments, tracer=tracer)
+    command_pipeline.add_stage("gate", gate_segment, policy=DROP_OLDEST)
+    command_pipeline.add_stage("asr", recognize_utterance)
+    command_pipeline.add_stage("parse", parse, max_age=15, key=coalescing_key)
+    command_pipeline.start()
+    capture.start()
+    startup_timer.mark("listening")
+    print("Listening...")
+    return command_pipeline
 
 # Function to process natural language with Gemini AI
 def process_with_gemini(command):
-    prompt = f"""
-    I am a voice-controlled browser assistant. Parse the following command and return a JSON object with:
-    1. "intent": The primary action being requested (open_website, search, scroll, navigate, click, etc.)
-    2. "target": The target website, search query, or element
-    3. "parameters": Any additional parameters
-    
-    Command: "{command}"
-    
-    For website requests like "open YouTube", set:
-    - intent: "open_website"
-    - target: "youtube.com"
-    
-    For scrolling commands, set:
-    - intent: "scroll"
-    - target: "down" for scrolling downward
-    - target: "up" for scrolling upward
-    - target: "top" for "scroll to top"
-    - target: "bottom" for "scroll to bottom"
-    
-    For search requests, extract the search query.
-    
-    For click commands like "click on X" or "open the link about Y", set:
-    - intent: "click"
-    - target: the text or description of what to click on
-    
-    Return ONLY the JSON object with no additional text.
-    """
+    # The fixed command grammar, including compound commands made of it, is parsed locally without a network round trip
+    local_result = parse_local(command)
+    if local_result is not None:
+        print(f"Parsed result (local): {local_result}")
+        return local_result
+
+    cached_result = intent_cache.get(command)
+    if cached_result is not None:
+        print(f"Parsed result (cached): {cached_result}")
+        return cached_result
+
+    # Only the command is sent; the instructions are the model's system instruction
+    try:
+        with tracer.span("gemini"):
+            response = get_gemini().generate(command)
+    except CircuitOpenError:
+        parsed_result = fallback_parse(command)
+        print(f"Parsed result (fallback, Gemini unavailable): {parsed_result}")
+        return parsed_result
+    except Exception as e:
+        # A slow or failing API must not hold up the browser; the local fallback parser answers instead
+        parsed_result = fallback_parse(command)
+        print(f"Error calling Gemini: {e!r}; parsed result (fallback): {parsed_result}")
+        return parsed_result
     
     try:
-        response = model.generate_content(prompt)
-        result = response.text.strip()
-        
-        # Extract the JSON object if it's wrapped in code blocks
-        json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', result, re.DOTALL)
-        if json_match:
-            result = json_match.group(1)
-        
-        # Parse the JSON
-        parsed_result = json.loads(result)
-        
-        # Debug the parsed result
+        parsed_result = parsed_command_from_reply(json.loads(response.text))
         print(f"Parsed result: {parsed_result}")
-        
-        # Handle common website names directly to avoid search confusion
-        if parsed_result["intent"] == "open_website":
-            website_map = {
-                "youtube": "youtube.com",
-                "google": "google.com",
-                "facebook": "facebook.com",
-                "twitter": "twitter.com",
-                "instagram": "instagram.com",
-                "linkedin": "linkedin.com",
-                "reddit": "reddit.com",
-                "amazon": "amazon.com",
-                "netflix": "netflix.com"
-            }
-            
-            # Check if target is a simple website name that should be mapped
-            for simple_name, domain in website_map.items():
-                if simple_name in parsed_result["target"].lower():
-                    parsed_result["target"] = domain
-                    break
-        
-        # Fix common scrolling command issues
-        if parsed_result["intent"] == "scroll":
-            scrolling_targets = ["scroll_start", "scroll_stop", "scroll_top", "scroll_bottom", 
-                                "start_scrolling", "stop_scrolling", "scroll_up", "scroll_down",
-                                "scrolling_start", "scrolling_stop"]
-            
-            if parsed_result["target"] in scrolling_targets:
-                # Map to expected targets
-                if "start" in parsed_result["target"] or "down" in parsed_result["target"]:
-                    parsed_result["target"] = "down"
-                elif "stop" in parsed_result["target"]:
-                    parsed_result["target"] = "stop"
-                elif "top" in parsed_result["target"]:
-                    parsed_result["target"] = "top"
-                elif "bottom" in parsed_result["target"]:
-                    parsed_result["target"] = "bottom"
-                elif "up" in parsed_result["target"]:
-                    parsed_result["target"] = "up"
-        
-        # Handle click intents better - extract anything that could be click-related
-        if "click" in command.lower() or "open" in command.lower() or "select" in command.lower() or "choose" in command.lower():
-            if parsed_result["intent"] not in ["click", "open_website"]:
-                # Try to extract what they want to click on
-                text_to_click = command.lower()
-                for prefix in ["click on ", "click ", "open ", "select ", "choose "]:
-                    if prefix in text_to_click:
-                        text_to_click = text_to_click.split(prefix, 1)[1]
-                        parsed_result["intent"] = "click"
-                        parsed_result["target"] = text_to_click
-                        break
-                    
+        intent_cache.put(command, parsed_result)
         return parsed_result
     except Exception as e:
         print(f"Error processing with Gemini: {e}")
         return {"intent": "unknown", "target": None, "parameters": {}}
 
+# Scroll and navigate targets dispatch_command acts on
+REPLY_TARGETS = {"scroll": ["down", "up", "top", "bottom", "stop"], "navigate": ["back", "forward", "refresh"]}
+
+# Function to map a scroll or navigate target in a reply, e.g. "Down", "scroll_down" or "go back", to one dispatch_command acts on
+def normalize_reply_target(intent, target):
+    choices = REPLY_TARGETS.get(intent)
+    if not choices or not target:
+        return target
+    target = normalize_scroll_target(target.strip().lower().replace(" ", "_"))
+    words = re.findall(r"[a-z]+", target.replace("reload", "refresh"))
+    return next((word for word in words if word in choices), target)
+
+# Function to turn a reply in INTENT_SCHEMA into the {intent, target, parameters} command used everywhere else
+def parsed_command_from_reply(reply):
+    if reply["intent"] == "plan":
+        steps = [{"intent": step["intent"], "target": normalize_reply_target(step["intent"], step.get("target")), "parameters": {}}
+                 for step in reply.get("steps", [])]
+        return plan_result(steps) if steps else {"intent": "unknown", "target": None, "parameters": {}}
+    return {"intent": reply["intent"], "target": normalize_reply_target(reply["intent"], reply.get("target")), "parameters": {}}
+
 # Function to perform a fixed scroll
 def fixed_scroll(driver, direction="down", scroll_amount=1000):
     try:
@@ -192,8 +333,24 @@ def open_website(driver, website):
     
     try:
         print(f"Opening URL: {url}")
-        driver.get(url)
+        started = time.perf_counter()
+        # A site kept warm in a background tab is a tab switch instead of a cold navigation
+        if browser_session is not None and browser_session.switch_to_site(driver, url):
+            kind = "warm"
+        else:
+            # With fast navigation this returns once the DOM is ready, not after every image and script
+            driver.get(url)
+            kind = "cold"
+            interactive = navigation_timer.record(driver)
+            if interactive is not None:
+                tracer.add_span(tracer.current(), "nav.interactive", interactive, site=domain_of(url))
+        elapsed = time.perf_counter() - started
+        tracer.add_span(tracer.current(), f"open.{kind}", elapsed, started)
+        if browser_session is not None:
+            browser_session.record_open(kind, elapsed)
         speak(f"Opening {website}")
+        # Build the element index now so follow-up click commands find it ready
+        page_index.snapshot(driver)
         return True
     except Exception as e:
         speak(f"Error opening {website}")
@@ -203,66 +360,22 @@ def open_website(driver, website):
 # Function to perform search on current website with improved error handling
 def perform_search(driver, query):
     try:
-        # First, try Google's search if we're on Google
-        if "google.com" in driver.current_url:
-            try:
-                # Direct approach for Google search
-                search_box = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.NAME, "q"))
-                )
-                search_box.clear()
-                search_box.send_keys(query)
-                search_box.send_keys(Keys.RETURN)
-                speak(f"Searching for {query} on Google")
-                return True
-            except Exception as e:
-                print(f"Google-specific search failed: {e}")
-                # Fall through to generic approach
-        
-        # Try YouTube's search if we're on YouTube
-        if "youtube.com" in driver.current_url:
-            try:
-                # Direct approach for YouTube search
-                search_box = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.NAME, "search_query"))
-                )
-                search_box.clear()
-                search_box.send_keys(query)
-                search_box.send_keys(Keys.RETURN)
-                speak(f"Searching for {query} on YouTube")
-                return True
-            except Exception as e:
-                print(f"YouTube-specific search failed: {e}")
-                # Fall through to generic approach
-                
-        # General approach - try multiple common search box identifiers with WebDriverWait
-        search_selectors = [
-            (By.XPATH, "//input[@type='search']"),
-            (By.XPATH, "//input[@name='q']"),
-            (By.XPATH, "//input[@name='search']"),
-            (By.XPATH, "//input[contains(@placeholder, 'search') or contains(@placeholder, 'Search')]"),
-            (By.XPATH, "//input[contains(@aria-label, 'search') or contains(@aria-label, 'Search')]"),
-            (By.XPATH, "//input[contains(@class, 'search') or contains(@id, 'search')]"),
-            (By.CSS_SELECTOR, "input[type='search']"),
-            (By.CSS_SELECTOR, "input.search"),
-            (By.CSS_SELECTOR, "input#search")
-        ]
+        # The selector that worked here last time comes first, then the site's own, then generic ones
+        url = driver.current_url
+        adapter, domain = adapter_for(url), domain_of(url)
+        selectors = selector_cache.order(domain, "search", adapter.search_selectors + GENERIC_SEARCH_SELECTORS)
         
-        for selector_type, selector in search_selectors:
-            try:
-                print(f"Trying selector: {selector_type} = {selector}")
-                search_box = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((selector_type, selector))
-                )
-                # We found a search box, let's use it
-                search_box.clear()
-                search_box.send_keys(query)
-                search_box.send_keys(Keys.RETURN)
-                speak(f"Searching for {query}")
-                return True
-            except (TimeoutException, ElementNotInteractableException, StaleElementReferenceException) as e:
-                print(f"Selector {selector} failed: {e}")
-                continue  # Try the next selector
+        # One in-page pass over every candidate finds, fills in and submits the search box
+        with tracer.span("search_box"):
+            found = find_search_box(driver, selectors, query, timeout=SEARCH_BOX_TIMEOUT)
+        if found is not None:
+            print(f"Search box found with selector: {found['selector']}")
+            selector_cache.record(domain, "search", found["selector"])
+            if not found["submitted"]:
+                from selenium.webdriver.common.keys import Keys
+                found["element"].send_keys(Keys.RETURN)
+            speak(f"Searching for {query} on {adapter.title}" if adapter.title else f"Searching for {query}")
+            return True
         
         # If no search box was found or usable, fallback to direct Bing search
         print("No usable search box found, falling back to Bing search")
@@ -287,8 +400,8 @@ def list_clickable_elements(driver):
     try:
         print("Scanning page for clickable elements...")
         
-        # Find all potential clickable elements
-        elements = driver.find_elements(By.XPATH, "//a | //button | //input[@type='button'] | //input[@type='submit'] | //*[@role='button']")
+        # One script call returns text, attributes and bounding box of every indexed element
+        elements = page_index.snapshot(driver)
         
         # Print count of elements found
         print(f"Found {len(elements)} potentially clickable elements")
@@ -296,28 +409,118 @@ def list_clickable_elements(driver):
         # Print details of elements with text or title
         count = 1
         for element in elements:
-            try:
-                text = element.text.strip() if element.text else ""
-                title = element.get_attribute("title") or ""
-                aria_label = element.get_attribute("aria-label") or ""
-                href = element.get_attribute("href") or ""
-                
-                # Only print elements with some identifiable text
-                if text or title or aria_label:
-                    print(f"Element {count}: Text='{text}', Title='{title}', Aria-Label='{aria_label}', Href='{href}'")
-                    count += 1
-                    
-            except StaleElementReferenceException:
-                # Element might have changed since we got the list
-                continue
+            text = element["text"]
+            title = element["title"]
+            aria_label = element["ariaLabel"]
+            href = element["href"]
+            
+            # Only print elements with some identifiable text
+            if text or title or aria_label:
+                print(f"Element {count}: Text='{text}', Title='{title}', Aria-Label='{aria_label}', Href='{href}'")
+                count += 1
                 
         return True
     except Exception as e:
         print(f"Error listing clickable elements: {e}")
         return False
 
-# Enhanced function to click on a link or element containing text
+# Function to list the open tabs with their titles and URLs
+def list_tabs(driver):
+    tabs = tab_manager.tabs(driver)
+    for number, tab in enumerate(tabs, 1):
+        print(f"{number}. {tab['title']} - {tab['url']}")
+    speak(f"{len(tabs)} tabs are open. Listed them in the console.")
+    return True
+
+# Function to close tabs by count or site, in one batch
+def close_tabs(driver, target):
+    closed = tab_manager.close_target(driver, target)
+    if not closed:
+        speak(f"No tabs to close for {target}.")
+        return False
+    speak(f"{closed} tabs closed." if closed > 1 else "Tab closed.")
+    return True
+
+# Function to switch to the tab a spoken name refers to
+def switch_to_tab(driver, name):
+    tab = tab_manager.switch(driver, name)
+    if tab is None:
+        speak(f"No open tab matches {name}.")
+        return False
+    speak(f"Switched to {tab['title'] or name}.")
+    return True
+
+# Function to click on a link or element containing text using the page index
 def click_element_with_text(driver, text):
+    if os.getenv("CLICK_STRATEGY") == "xpath":
+        return click_element_with_text_xpath(driver, text)
+
+    try:
+        # Normalize the search text
+        text = text.lower().strip()
+        print(f"Looking for element containing: '{text}'")
+
+        site = adapter_for(driver.current_url).name
+
+        # Rank every indexed candidate in one script call, giving a still-loading page up to 2 s
+        deadline = time.time() + 2
+        candidates = page_index.resolve(driver, text, site)
+        with tracer.span("wait.page_ready"):
+            while not candidates and time.time() < deadline and driver.execute_script("return document.readyState") != "complete":
+                time.sleep(0.2)
+                candidates = page_index.resolve(driver, text, site)
+        print(f"Resolver found {len(candidates)} candidates")
+
+        for candidate in candidates:
+            element = candidate["element"]
+            try:
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+                time.sleep(0.2)  # Small pause to let the page settle
+                with tracer.span("webdriver.click", tier=candidate["tier"]):
+                    element.click()
+                speak(f"Clicked on {text}")
+                return True
+            except WebDriverException as e:
+                # e.g. a cookie banner or overlay intercepting the click; the next candidate may still work
+                print(f"Element interaction failed for tier {candidate['tier']}: {e}")
+                continue
+
+        # No element contains the text as said; rank the clickable elements by word overlap instead
+        with tracer.span("fuzzy_match"):
+            matches = fuzzy_match.rank(text, page_index.snapshot(driver))
+        print(f"Fuzzy matcher found {len(matches)} candidates above the threshold")
+        for match in matches:
+            entry = match["entry"]
+            label = entry["text"] or entry["ariaLabel"] or entry["title"] or entry["alt"] or text
+            try:
+                element = page_index.element(driver, entry["id"])
+                if element is None:
+                    continue
+                time.sleep(0.2)  # Small pause to let the page settle
+                with tracer.span("webdriver.click", score=match["score"]):
+                    element.click()
+                print(f"Clicked '{label[:80]}' (score {match['score']}, matched on {match['field']})")
+                speak(f"Clicked on {label[:60]}")
+                return True
+            except WebDriverException as e:
+                print(f"Element interaction failed for fuzzy match '{label[:80]}': {e}")
+                continue
+
+        # If we reached here, try to list all available clickable elements for debugging
+        list_clickable_elements(driver)
+        speak(f"Could not find clickable element containing {text}")
+        return False
+
+    except Exception as e:
+        speak(f"Error clicking element")
+        print(f"Error: {e}")
+        return False
+
+# Enhanced function to click on a link or element containing text, one XPath at a time
+def click_element_with_text_xpath(driver, text):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     try:
         # Normalize the search text
         text = text.lower().strip()
@@ -325,15 +528,16 @@ def click_element_with_text(driver, text):
         
         # First, try exact matches with these specific strategies for search results
         search_result_strategies = []
+        site = adapter_for(driver.current_url).name
         
-        if "google.com" in driver.current_url:
+        if site == "google":
             # Google-specific search result selectors
             search_result_strategies = [
                 f"//h3[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{text}')]/ancestor::a",
                 f"//div[contains(@class, 'g')]//a[contains(., '{text}')]",
                 f"//div[contains(@class, 'yuRUbf')]/a[contains(., '{text}')]"
             ]
-        elif "bing.com" in driver.current_url:
+        elif site == "bing":
             # Bing-specific search result selectors
             search_result_strategies = [
                 f"//h2[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{text}')]/ancestor::a",
@@ -344,9 +548,10 @@ def click_element_with_text(driver, text):
         for xpath in search_result_strategies:
             try:
                 print(f"Trying site-specific selector: {xpath}")
-                element = WebDriverWait(driver, 2).until(
-                    EC.element_to_be_clickable((By.XPATH, xpath))
-                )
+                with tracer.span("wait.click_target", xpath=xpath[:120]):
+                    element = WebDriverWait(driver, 2).until(
+                        EC.element_to_be_clickable((By.XPATH, xpath))
+                    )
                 # Scroll element into view
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
                 time.sleep(0.2)  # Small pause to let the page settle
@@ -469,79 +674,41 @@ def click_numbered_result(driver, number_text):
             
         print(f"Trying to click on result number {number}")
         
-        # Handle different search engines differently
-        if "google.com" in driver.current_url:
-            # For Google
-            xpath = f"(//div[@class='g']//a)[{number}]"
-            backup_xpath = f"(//h3/parent::a)[{number}]"
-            
-            try:
-                element = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, xpath))
-                )
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-                time.sleep(0.2)
-                element.click()
-                speak(f"Clicked on result number {number}")
-                return True
-            except Exception:
-                try:
-                    element = WebDriverWait(driver, 3).until(
-                        EC.element_to_be_clickable((By.XPATH, backup_xpath))
-                    )
-                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+        # Each site lists its results differently; the selector that worked here last time comes first
+        url = driver.current_url
+        adapter, domain = adapter_for(url), domain_of(url)
+        selectors = selector_cache.order(domain, "results", adapter.result_selectors) if adapter.result_selectors else []
+        
+        # Query the page index, polling for up to 3 s while site results are still loading
+        match = None
+        if selectors:
+            deadline = time.time() + 3
+            with tracer.span("wait.results", selectors=len(selectors)):
+                match = page_index.nth(driver, selectors, number)
+                while match is None and time.time() < deadline:
                     time.sleep(0.2)
-                    element.click()
-                    speak(f"Clicked on result number {number}")
-                    return True
-                except Exception as e:
-                    print(f"Failed to click Google result {number}: {e}")
+                    match = page_index.nth(driver, selectors, number)
+            if match is not None:
+                selector_cache.record(domain, "results", match["selector"])
         
-        elif "bing.com" in driver.current_url:
-            # For Bing
-            xpath = f"(//li[@class='b_algo']//h2/a)[{number}]"
-            
-            try:
-                element = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, xpath))
-                )
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-                time.sleep(0.2)
-                element.click()
-                speak(f"Clicked on result number {number}")
-                return True
-            except Exception as e:
-                print(f"Failed to click Bing result {number}: {e}")
-                
-        elif "youtube.com" in driver.current_url:
-            # For YouTube
-            xpath = f"(//ytd-video-renderer//a[@id='thumbnail'])[{number}]"
-            
-            try:
-                element = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, xpath))
-                )
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-                time.sleep(0.2)
-                element.click()
-                speak(f"Clicked on video number {number}")
-                return True
-            except Exception as e:
-                print(f"Failed to click YouTube video {number}: {e}")
+        # Generic approach for other sites - the nth link
+        if match is None:
+            match = page_index.nth(driver, [("a", "link")], number)
+        
+        if match is None:
+            print(f"Failed to find result {number}")
+            speak(f"Could not find result number {number}")
+            return False
         
-        # Generic approach for other sites - try to find the nth link
-        xpath = f"(//a)[{number}]"
         try:
-            element = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, xpath))
-            )
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+            element = page_index.element(driver, match["id"])
             time.sleep(0.2)
-            element.click()
-            speak(f"Clicked on link number {number}")
+            with tracer.span("webdriver.click", label=match["label"]):
+                element.click()
+            speak(f"Clicked on {match['label']} number {number}")
             return True
         except Exception as e:
-            print(f"Failed to click generic link {number}: {e}")
+            print(f"Failed to click {match['label']} {number}: {e}")
             speak(f"Could not find result number {number}")
             return False
             
@@ -550,98 +717,196 @@ def click_numbered_result(driver, number_text):
         print(f"Error: {e}")
         return False
         
+# Function to wait after a plan step until the page it may have started loading has what the next step needs
+def wait_for_page_ready(driver, previous_url, next_step, navigation_timeout=2, timeout=10):
+    # Navigation started by a key press or a click may not have begun yet
+    deadline = time.time() + navigation_timeout
+    while driver.current_url == previous_url and time.time() < deadline:
+        time.sleep(0.1)
+    deadline = time.time() + timeout
+    # A search only needs the search box; anything else needs the DOM parsed, not every image loaded
+    if next_step.get("intent") == "search":
+        selectors = adapter_for(driver.current_url).search_selectors + GENERIC_SEARCH_SELECTORS
+        return find_search_box(driver, selectors, timeout=timeout) is not None
+    while driver.execute_script("return document.readyState") == "loading":
+        if time.time() > deadline:
+            return False
+        time.sleep(0.1)
+    interactive = navigation_timer.record(driver)
+    if interactive is not None:
+        tracer.add_span(tracer.current(), "nav.interactive", interactive, site=domain_of(driver.current_url))
+    return True
+
+# Function to describe a plan step when reporting it
+def describe_step(step):
+    target = step.get("target")
+    return f"{step.get('intent', 'unknown').replace('_', ' ')} {target}" if target else step.get("intent", "unknown")
+
+# Function to run the steps of a plan back to back, stopping at the first one that fails
+def execute_plan(driver, steps):
+    for number, step in enumerate(steps, 1):
+        intent = step.get("intent", "unknown")
+        previous_url = driver.current_url
+        print(f"Plan step {number} of {len(steps)}: {step}")
+        with tracer.span("plan.step", step=number, intent=intent):
+            # Plans cannot nest, exit or contain commands nobody understood
+            ok = intent not in ("plan", "exit", "quit", "unknown") and dispatch_command(driver, step)
+        if not ok:
+            print(f"Plan stopped at step {number}: {step}")
+            speak(f"Step {number} of {len(steps)}, {describe_step(step)}, failed. Stopping here.")
+            return False
+        # Searches and clicks load their page after returning; the next step needs it ready
+        if number < len(steps) and intent in ("search", "click"):
+            with tracer.span("wait.page_ready", step=number):
+                wait_for_page_ready(driver, previous_url, steps[number])
+    return True
+
+# Function to run one parsed command against the browser, repeated count times where that makes sense
+def dispatch_command(driver, parsed_command, count=1):
+    intent = parsed_command.get("intent", "unknown")
+    target = parsed_command.get("target") or ""
+    parameters = parsed_command.get("parameters", {})
+    
+    # Handle different intents
+    if intent == "open_website":
+        return open_website(driver, target)
+        
+    elif intent == "search":
+        return perform_search(driver, target)
+        
+    elif intent == "scroll":
+        if target == "down":
+            return fixed_scroll(driver, "down", SCROLL_AMOUNT * count)
+        elif target == "up":
+            return fixed_scroll(driver, "up", SCROLL_AMOUNT * count)
+        elif target == "top":
+            return fixed_scroll(driver, "top")
+        elif target == "bottom":
+            return fixed_scroll(driver, "bottom")
+            
+    elif intent == "navigate":
+        if target == "back":
+            driver.back()
+            speak("Going back.")
+            return True
+        elif target == "forward":
+            driver.forward()
+            speak("Going forward.")
+            return True
+        elif target == "refresh":
+            driver.refresh()
+            speak("Refreshing page.")
+            return True
+            
+    elif intent == "click":
+        # Check if the target references a numbered result
+        numbered_terms = ["first", "second", "third", "fourth", "fifth", 
+                         "1st", "2nd", "3rd", "4th", "5th",
+                         "result number", "link number", "number"]
+                         
+        is_numbered = any(term in target.lower() for term in numbered_terms) or re.search(r'\d+', target)
+        
+        if is_numbered:
+            return click_numbered_result(driver, target)
+        else:
+            return click_element_with_text(driver, target)
+        
+    elif intent == "plan":
+        return execute_plan(driver, parameters.get("steps", []))
+        
+    elif intent == "list" and "tabs" in target:
+        return list_tabs(driver)
+        
+    elif intent == "close_tabs":
+        return close_tabs(driver, target)
+        
+    elif intent == "switch_tab":
+        return switch_to_tab(driver, target)
+        
+    elif intent == "list" and "links" in target:
+        # Diagnostic command to list all clickable elements
+        list_clickable_elements(driver)
+        speak("Listed all clickable elements in the console.")
+        return True
+        
+    elif intent == "unknown":
+        speak("I'm not sure how to handle that command. Please try again.")
+        
+    return False
+
+# Function to start Edge with the persistent profile, or reattach to the one a previous run left open
+def start_browser():
+    global browser_session, tab_manager
+    with startup_timer.timed("init.browser"):
+        browser_session = create_session()
+        driver = TracedDriver(browser_session.start(), tracer)
+        tab_manager = create_tab_manager(browser_session)
+    with startup_timer.timed("init.warm_tabs"):
+        browser_session.warm_up(driver)
+    
+    # Open a blank page to start
+    if not browser_session.reattached:
+        driver.get("about:blank")
+    return driver
+
+# Function to print the browser-side statistics and close the browser session
+def close_browser(driver):
+    print(f"Intent cache stats: {intent_cache.stats()}")
+    print(f"Gemini client stats: {gemini.stats() if gemini else 'not used'}")
+    print(f"Selector cache stats: {selector_cache.stats()}")
+    print(f"Browser session stats: {browser_session.stats()}")
+    print(f"Navigation to interactive by site: {navigation_timer.stats()}")
+    print(f"Tab stats: {tab_manager.stats()}")
+    selector_cache.flush()
+    browser_session.close(driver)
+
 # Main function to handle voice commands and control the browser
 def voice_controlled_browser():
-    global command_received
-    # Start the listening thread
-    listen_thread_instance = threading.Thread(target=listen_thread, daemon=True)
-    listen_thread_instance.start()
+    # Gemini is imported and configured in the background, ready for the first command
+    startup_timer.warm("init.gemini", get_gemini)
     
-    # Set up the Selenium WebDriver with options
-    options = webdriver.EdgeOptions()
-    options.add_argument("--start-maximized")
-    options.add_argument("--disable-notifications")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option("useAutomationExtension", False)
+    # Start listening, recognizing and parsing in the background
+    start_command_pipeline()
     
-    service = Service(executable_path=os.getenv('EDGE_WEBDRIVER_PATH'))  # Update the path
-    driver = webdriver.Edge(service=service, options=options)
-    
-    # Open a blank page to start
-    driver.get("about:blank")
+    driver = start_browser()
     speak("Enhanced voice-controlled browser is ready. What would you like to do?")
-    
-    # Define default scroll amount (can be adjusted based on user preference)
-    scroll_amount = 300
+    startup_timer.mark("browser ready")
+    print(startup_timer.report())
     
     while True:
-        if command_received:
-            # Process the command with Gemini API
-            parsed_command = process_with_gemini(command_received)
-            print(f"Parsed command: {parsed_command}")
-            
-            intent = parsed_command.get("intent", "unknown")
-            target = parsed_command.get("target", "")
-            parameters = parsed_command.get("parameters", {})
-            
-            # Handle different intents
-            if intent == "open_website":
-                open_website(driver, target)
-                
-            elif intent == "search":
-                perform_search(driver, target)
-                
-            elif intent == "scroll":
-                if target == "down":
-                    fixed_scroll(driver, "down", scroll_amount)
-                elif target == "up":
-                    fixed_scroll(driver, "up", scroll_amount)
-                elif target == "top":
-                    fixed_scroll(driver, "top")
-                elif target == "bottom":
-                    fixed_scroll(driver, "bottom")
-                    
-            elif intent == "navigate":
-                if target == "back":
-                    driver.back()
-                    speak("Going back.")
-                elif target == "forward":
-                    driver.forward()
-                    speak("Going forward.")
-                elif target == "refresh":
-                    driver.refresh()
-                    speak("Refreshing page.")
-                    
-            elif intent == "click":
-                # Check if the target references a numbered result
-                numbered_terms = ["first", "second", "third", "fourth", "fifth", 
-                                 "1st", "2nd", "3rd", "4th", "5th",
-                                 "result number", "link number", "number"]
-                                 
-                is_numbered = any(term in target.lower() for term in numbered_terms) or re.search(r'\d+', target)
-                
-                if is_numbered:
-                    click_numbered_result(driver, target)
-                else:
-                    click_element_with_text(driver, target)
-                
-            elif intent == "exit" or intent == "quit":
-                speak("Exiting the browser.")
-                driver.quit()
-                break
-                
-            elif intent == "list" and "links" in target:
-                # Diagnostic command to list all clickable elements
-                list_clickable_elements(driver)
-                speak("Listed all clickable elements in the console.")
-                
-            elif intent == "unknown":
-                speak("I'm not sure how to handle that command. Please try again.")
-                
-            command_received = None
+        # Block until the next parsed command, so the idle loop does not wake up
+        command = command_pipeline.output.get()
+        if command is None:
+            break
+        parsed_command = command.value
+        intent = parsed_command.get("intent", "unknown")
+        trace = command.context
+        tracer.add_span(trace, "queue.parse", command.age())
+        print(f"Parsed command: {parsed_command} (x{command.count})")
+        
+        if intent in ("exit", "quit"):
+            speak("Exiting the browser.", wait=True)
+            print(f"Speech gate stats: {speech_gate.stats()}")
+            print(f"Pipeline stats: {command_pipeline.stats()}")
+            print(tracer.report())
+            tracer.write_summary()
+            command_pipeline.close()
+            close_browser(driver)
+            break
         
-        time.sleep(0.1)  # Small pause to prevent CPU overuse
+        with tracer.use(trace):
+            with tracer.span("dispatch", intent=intent):
+                # A failed command is reported and the loop keeps listening
+                try:
+                    dispatch_command(driver, parsed_command, command.count)
+                    # Keeps the tab pool bounded, closing the least recently used tabs
+                    tab_manager.touch(driver)
+                except Exception as e:
+                    print(f"Error running {intent}: {e}")
+                    speak(f"An unexpected error occurred: {e}")
+            tracer.finish(trace, intent)
 
 if __name__ == "__main__":
+    # The greeting plays while the rest of startup runs
     speak("Enhanced voice-controlled browser automation is starting.")
     voice_controlled_browser()
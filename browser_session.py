@@ -0,0 +1,188 @@
+import json
+import os
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+from fast_navigation import create_fast_navigation
+from intent_parser import WEBSITE_MAP
+
+
+def _host(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class BrowserSession:
+    """Starts Edge with a persistent profile, or reattaches to the Edge a previous run left open.
+
+    With reattach set (and a profile_dir), the browser is launched with a remote-debugging port
+    and is not closed if the assistant crashes, so a restart reattaches to it with all its tabs,
+    cookies and cache. The port stays open as long as that Edge runs, and anything on the machine
+    can drive the logged-in profile through it; a listener is only reattached to when the
+    profile's DevToolsActivePort file shows it is the browser launched on that profile.
+
+    Sites in warm_sites are kept open in background tabs, so opening one of them is a tab
+    switch instead of a cold navigation. fast_navigation, if given, is applied to the
+    browser and to every tab the session opens.
+    """
+
+    def __init__(self, profile_dir=None, debug_port=9222, driver_path=None, warm_sites=(), fast_navigation=None,
+                 reattach=False):
+        self.profile_dir = profile_dir
+        self.debug_port = debug_port
+        # Without a profile there is no way to tell our browser from another one on the port
+        self.reattach = reattach and bool(profile_dir)
+        self.driver_path = driver_path
+        self.warm_sites = [WEBSITE_MAP.get(site, site) for site in warm_sites]
+        self.fast_navigation = fast_navigation
+        self.reattached = False
+        self.startup_time = None
+        self.warm_tabs = {}
+        self.open_times = {"cold": [], "warm": []}
+        self._main_handle = None
+
+    def start(self):
+        """Returns a WebDriver for the running browser, launching it first if none is listening."""
+        started = time.perf_counter()
+        # Importing selenium.webdriver loads every browser's driver module, so it waits until a browser is needed
+        from selenium import webdriver
+        from selenium.webdriver.edge.service import Service
+        service = Service(executable_path=self.driver_path) if self.driver_path else None
+        self.reattached = self._browser_running()
+        options = webdriver.EdgeOptions()
+        if self.reattached:
+            options.debugger_address = f"127.0.0.1:{self.debug_port}"
+        else:
+            options.add_argument("--start-maximized")
+            options.add_argument("--disable-notifications")
+            if self.profile_dir:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                options.add_argument(f"--user-data-dir={self.profile_dir}")
+            options.add_experimental_option("excludeSwitches", ["enable-automation"])
+            options.add_experimental_option("useAutomationExtension", False)
+            if self.reattach:
+                options.add_argument(f"--remote-debugging-port={self.debug_port}")
+                # Leave the browser running when the driver goes away, so the next run can reattach
+                options.add_experimental_option("detach", True)
+        if self.fast_navigation is not None:
+            self.fast_navigation.configure(options, launching=not self.reattached)
+        driver = webdriver.Edge(service=service, options=options) if service else webdriver.Edge(options=options)
+        self._apply_fast_navigation(driver)
+        self._main_handle = driver.current_window_handle
+        self.startup_time = time.perf_counter() - started
+        print(f"Browser {'reattached' if self.reattached else 'started'} in {self.startup_time:.2f} s")
+        return driver
+
+    def _apply_fast_navigation(self, driver):
+        if self.fast_navigation is not None:
+            self.fast_navigation.apply(driver)
+
+    def new_tab(self, driver):
+        """Opens a blank tab with the session's settings and switches to it."""
+        driver.switch_to.new_window("tab")
+        self._apply_fast_navigation(driver)
+        return driver.current_window_handle
+
+    def _browser_running(self):
+        """Tells whether the browser listening on debug_port is the one launched on profile_dir."""
+        if not self.reattach:
+            return False
+        # Edge writes its debugging port and browser target path into the profile it runs on
+        try:
+            with open(os.path.join(self.profile_dir, "DevToolsActivePort")) as f:
+                port, path = f.read().split()[:2]
+        except (OSError, ValueError):
+            return False
+        if port != str(self.debug_port):
+            return False
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{self.debug_port}/json/version", timeout=0.5) as response:
+                version = json.load(response)
+        except (OSError, ValueError):
+            return False
+        if not version.get("webSocketDebuggerUrl", "").endswith(path):
+            print(f"Not reattaching: the browser on port {self.debug_port} was not started on {self.profile_dir}")
+            return False
+        return True
+
+    def warm_up(self, driver):
+        """Opens a background tab for each warm site, reusing tabs a previous run left open."""
+        if not self.warm_sites:
+            return
+        started = time.perf_counter()
+        # After a reattach the warm tabs are usually still there
+        for handle in driver.window_handles:
+            driver.switch_to.window(handle)
+            self._apply_fast_navigation(driver)
+            host = _host(driver.current_url)
+            if host in self.warm_sites and host not in self.warm_tabs:
+                self.warm_tabs[host] = handle
+        if self._main_handle in self.warm_tabs.values():
+            others = [handle for handle in driver.window_handles if handle not in self.warm_tabs.values()]
+            if others:
+                self._main_handle = others[0]
+            else:
+                self._main_handle = self.new_tab(driver)
+        for site in self.warm_sites:
+            if site not in self.warm_tabs:
+                self.new_tab(driver)
+                driver.get(f"https://{site}")
+                self.warm_tabs[site] = driver.current_window_handle
+        driver.switch_to.window(self._main_handle)
+        print(f"Warm tabs ready for {', '.join(self.warm_tabs)} in {time.perf_counter() - started:.2f} s")
+
+    def switch_to_site(self, driver, url):
+        """Switches to the warm tab for url's site and returns True, or returns False if there is none."""
+        handle = self.warm_tabs.get(_host(url))
+        if handle is None:
+            return False
+        if handle not in driver.window_handles:
+            del self.warm_tabs[_host(url)]
+            return False
+        driver.switch_to.window(handle)
+        # The tab may have moved on since it was warmed up; the site's cache is still hot
+        if _host(driver.current_url) != _host(url):
+            driver.get(url)
+        return True
+
+    def record_open(self, kind, seconds):
+        times = self.open_times[kind]
+        times.append(seconds)
+        del times[:-100]
+
+    def stats(self):
+        """Returns startup time, whether the browser was reattached, and median cold and warm open times."""
+        median = lambda times: round(sorted(times)[len(times) // 2], 3) if times else None
+        return {
+            "startup_s": round(self.startup_time, 3) if self.startup_time is not None else None,
+            "reattached": self.reattached,
+            "warm_tabs": list(self.warm_tabs),
+            "cold_opens": len(self.open_times["cold"]),
+            "cold_open_p50_s": median(self.open_times["cold"]),
+            "warm_opens": len(self.open_times["warm"]),
+            "warm_open_p50_s": median(self.open_times["warm"]),
+        }
+
+    def close(self, driver):
+        """Closes the browser; unlike a crash, exiting on purpose does not leave it for the next run."""
+        driver.quit()
+
+
+def create_session():
+    """Returns a BrowserSession configured from EDGE_WEBDRIVER_PATH and the ALFRED_BROWSER_* variables.
+
+    Leaving the browser running for the next run is opt-in with ALFRED_BROWSER_REATTACH=1.
+    """
+    profile_dir = os.getenv("ALFRED_BROWSER_PROFILE")
+    if profile_dir is None:
+        profile_dir = os.path.join(os.path.expanduser("~"), ".alfred", "edge-profile")
+    warm_sites = os.getenv("ALFRED_WARM_TABS", "google,youtube")
+    return BrowserSession(
+        profile_dir=profile_dir or None,
+        debug_port=int(os.getenv("ALFRED_BROWSER_DEBUG_PORT", "9222")),
+        driver_path=os.getenv("EDGE_WEBDRIVER_PATH"),
+        warm_sites=[site.strip() for site in warm_sites.split(",") if site.strip()],
+        fast_navigation=create_fast_navigation(),
+        reattach=os.getenv("ALFRED_BROWSER_REATTACH", "0") == "1",
+    )
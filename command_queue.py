@@ -0,0 +1,141 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+# What put() does when the queue is full
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+_command_ids = itertools.count(1)
+
+
+class Command:
+    """A queued value with its arrival time and how many repeats were merged into it."""
+
+    def __init__(self, value, key=None, context=None):
+        self.id = next(_command_ids)
+        self.value = value
+        self.key = key
+        self.context = context
+        self.count = 1
+        self.created = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.created
+
+    def __repr__(self):
+        return f"Command(id={self.id}, value={self.value!r}, count={self.count})"
+
+
+class CommandQueue:
+    """Bounded thread-safe queue with back-pressure, coalescing and stale-command expiry.
+
+    Consecutive puts with the same non-None key are merged into the pending command by
+    incrementing its count. Commands older than max_age seconds are dropped by get().
+    """
+
+    def __init__(self, maxsize=16, policy=BLOCK, max_age=None, name="commands"):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.max_age = max_age
+        self.name = name
+        self.put_count = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.expired = 0
+        self.cancelled = 0
+        self._items = deque()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def put(self, value, key=None, timeout=None, context=None):
+        """Queues a value and returns its Command, or None if it was dropped.
+
+        context is carried along untouched, e.g. the trace of the command. When the value is
+        merged into a pending command, the returned Command keeps that command's context.
+        """
+        with self._lock:
+            if self._closed:
+                return None
+            self.put_count += 1
+            if key is not None and self._items and self._items[-1].key == key:
+                self._items[-1].count += 1
+                self.coalesced += 1
+                return self._items[-1]
+
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    dropped = self._items.popleft()
+                    self.dropped += 1
+                    print(f"{self.name} queue full, dropped {dropped.value!r}")
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    print(f"{self.name} queue full, dropped {value!r}")
+                    return None
+                elif not self._not_full.wait_for(lambda: len(self._items) < self.maxsize or self._closed, timeout):
+                    self.dropped += 1
+                    print(f"{self.name} queue still full after {timeout} s, dropped {value!r}")
+                    return None
+                if self._closed:
+                    return None
+
+            command = Command(value, key, context)
+            self._items.append(command)
+            self._not_empty.notify()
+            return command
+
+    def get(self, timeout=None):
+        """Blocks until a fresh command is available and returns it, or None on timeout or close."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                while self._items:
+                    command = self._items.popleft()
+                    self._not_full.notify()
+                    if self.max_age is not None and command.age() > self.max_age:
+                        self.expired += 1
+                        print(f"Dropping stale command {command.value!r} ({command.age():.1f} s old)")
+                        continue
+                    return command
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._not_empty.wait(remaining)
+
+    def cancel_pending(self):
+        """Drops every queued command and returns how many were dropped."""
+        with self._lock:
+            count = len(self._items)
+            self._items.clear()
+            self.cancelled += count
+            self._not_full.notify_all()
+            return count
+
+    def close(self):
+        """Wakes all waiting threads; get() returns None once the queue is drained."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def stats(self):
+        """Returns the queue counters."""
+        with self._lock:
+            return {
+                "pending": len(self._items),
+                "put": self.put_count,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "expired": self.expired,
+                "cancelled": self.cancelled,
+            }
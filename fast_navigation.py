@@ -0,0 +1,99 @@
+import os
+from collections import defaultdict, deque
+
+from site_adapters import domain_of
+
+# URL patterns blocked through DevTools for each kind of resource that can be switched off
+BLOCKABLE_RESOURCES = {
+    "images": ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.m4a", "*.mp3", "*.ogg"],
+    "trackers": [
+        "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*", "*adservice.google.*",
+        "*google-analytics.com*", "*googletagmanager.com*", "*connect.facebook.net*", "*amazon-adsystem.com*",
+        "*scorecardresearch.com*", "*taboola.com*", "*outbrain.com*", "*criteo.com*", "*hotjar.com*",
+        "*adnxs.com*", "*quantserve.com*",
+    ],
+}
+
+# Reports when the current page became interactive, relative to the start of its navigation
+NAVIGATION_TIMING_JS = """
+const entry = performance.getEntriesByType('navigation')[0];
+if (!entry || !entry.domInteractive) return null;
+return {interactive: entry.domInteractive, contentLoaded: entry.domContentLoadedEventEnd, load: entry.loadEventEnd};
+"""
+
+
+class FastNavigation:
+    """Browser settings that make pages usable sooner.
+
+    driver.get returns once the DOM is ready instead of after every image and script has
+    loaded (eager page-load strategy), the resource kinds in block are refused through
+    DevTools Network.setBlockedURLs, and media does not autoplay without a click.
+    """
+
+    def __init__(self, enabled=True, block=("fonts", "media", "trackers"), block_autoplay=True):
+        self.enabled = enabled
+        self.block = [kind for kind in block if kind in BLOCKABLE_RESOURCES]
+        self.block_autoplay = block_autoplay
+
+    def blocked_patterns(self):
+        return [pattern for kind in self.block for pattern in BLOCKABLE_RESOURCES[kind]]
+
+    def configure(self, options, launching=True):
+        """Adds the fast-navigation settings to EdgeOptions; launch flags only apply to a new browser."""
+        if not self.enabled:
+            return
+        options.page_load_strategy = "eager"
+        if launching and self.block_autoplay:
+            options.add_argument("--autoplay-policy=user-gesture-required")
+
+    def apply(self, driver):
+        """Turns on resource blocking for the current tab; DevTools settings are per tab."""
+        patterns = self.blocked_patterns()
+        if not self.enabled or not patterns:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except Exception as e:
+            print(f"Could not block resources: {e}")
+
+
+class NavigationTimer:
+    """Keeps the navigation-to-interactive time of recent page loads per site."""
+
+    def __init__(self, window=50):
+        self._times = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, driver):
+        """Reads the current page's navigation timing and returns its seconds to interactive, or None."""
+        try:
+            timing = driver.execute_script(NAVIGATION_TIMING_JS)
+        except Exception as e:
+            print(f"Could not read navigation timing: {e}")
+            return None
+        if not timing:
+            return None
+        seconds = timing["interactive"] / 1000
+        self._times[domain_of(driver.current_url) or "other"].append(seconds)
+        return seconds
+
+    def stats(self):
+        """Returns {site: {"count", "p50_ms", "max_ms"}} of the times to interactive."""
+        result = {}
+        for site, times in self._times.items():
+            ordered = sorted(times)
+            result[site] = {"count": len(ordered), "p50_ms": round(ordered[len(ordered) // 2] * 1000),
+                            "max_ms": round(ordered[-1] * 1000)}
+        return result
+
+
+def create_fast_navigation():
+    """Returns FastNavigation configured from ALFRED_FAST_NAV, ALFRED_BLOCK_RESOURCES and ALFRED_BLOCK_AUTOPLAY."""
+    block = os.getenv("ALFRED_BLOCK_RESOURCES", "fonts,media,trackers")
+    return FastNavigation(
+        enabled=os.getenv("ALFRED_FAST_NAV", "1") != "0",
+        block=[kind.strip() for kind in block.split(",") if kind.strip()],
+        block_autoplay=os.getenv("ALFRED_BLOCK_AUTOPLAY", "1") != "0",
+    )
@@ -0,0 +1,298 @@
+import bisect
+import heapq
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from fuzzy_match import token_set_similarity, tokens
+
+try:
+    # Uses inotify on Linux, FSEvents on macOS and ReadDirectoryChangesW on Windows
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # the index is still built, but only sees changes made through it
+    FileSystemEventHandler = object
+    Observer = None
+
+# Folders that are large, change constantly, and are never what someone asks for by name
+SKIP_DIRS = {"node_modules", "__pycache__", "venv", "site-packages", "AppData", "Library", "$RECYCLE.BIN"}
+
+
+def default_roots():
+    """Returns the folders in ALFRED_INDEX_ROOTS (separated by os.pathsep), or the desktop, documents and downloads."""
+    roots = os.getenv("ALFRED_INDEX_ROOTS")
+    if roots:
+        return [os.path.expanduser(root) for root in roots.split(os.pathsep) if root]
+    home = os.path.expanduser("~")
+    return [os.path.join(home, folder) for folder in ("Desktop", "Documents", "Downloads")]
+
+
+def _skipped(name):
+    return name.startswith(".") or name in SKIP_DIRS
+
+
+class _IndexUpdater(FileSystemEventHandler):
+    """Applies file system events to a FileIndex as they happen."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        self.index.add(event.src_path, event.is_directory)
+
+    def on_deleted(self, event):
+        self.index.remove(event.src_path)
+
+    def on_moved(self, event):
+        self.index.remove(event.src_path)
+        self.index.add(event.dest_path, event.is_directory)
+
+
+class FileIndex:
+    """In-memory index of the files and folders under a few root folders, for lookups by spoken name.
+
+    The index is built on a background thread and then kept current from file system events
+    (watchdog) instead of rescans. Each entry is a (folder id, name, is folder) tuple with
+    folder paths stored once, and every word of a name points to the entries containing it,
+    so a lookup only scores entries sharing a word, or a close spelling of one, with the query.
+    Until the index is ready, and whenever it is not watching for changes, exists() asks the
+    file system directly.
+    """
+
+    def __init__(self, roots=(), watch=True):
+        self.roots = [os.path.abspath(root) for root in roots if os.path.isdir(root)]
+        self.watch = watch
+        self.ready = threading.Event()
+        self.build_seconds = None
+        self.updates = 0
+        self._lock = threading.RLock()
+        self._dirs = []
+        self._dir_ids = {}
+        self._entries = []
+        self._ids = {}
+        self._children = defaultdict(set)
+        self._free = []
+        self._postings = defaultdict(set)
+        self._vocabulary = []
+        self._vocabulary_stale = False
+        self._observer = None
+        self._thread = None
+
+    def start(self):
+        """Builds the index on a background thread, then starts watching the roots for changes."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._build, name="file-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _build(self):
+        started = time.perf_counter()
+        for root in self.roots:
+            self._walk(root)
+        self.build_seconds = time.perf_counter() - started
+        self.ready.set()
+        print(f"Indexed {len(self._ids)} files and folders in {self.build_seconds:.2f} s")
+        if self.watch and self.roots:
+            if Observer is None:
+                print("File index will not see changes made outside the assistant; pip install watchdog to keep it current")
+                return
+            self._observer = Observer()
+            updater = _IndexUpdater(self)
+            for root in self.roots:
+                self._observer.schedule(updater, root, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+
+    def _walk(self, top):
+        stack = [top]
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    found = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in entries]
+            except OSError:
+                continue
+            with self._lock:
+                for name, is_dir in found:
+                    if is_dir and _skipped(name):
+                        continue
+                    self._add(folder, name, is_dir)
+                    if is_dir:
+                        stack.append(os.path.join(folder, name))
+
+    def _root_of(self, path):
+        for root in self.roots:
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return None
+
+    def _dir_id(self, folder):
+        key = os.path.normcase(folder)
+        dir_id = self._dir_ids.get(key)
+        if dir_id is None:
+            dir_id = self._dir_ids[key] = len(self._dirs)
+            self._dirs.append(folder)
+        return dir_id
+
+    def _add(self, folder, name, is_dir):
+        key = (self._dir_id(folder), os.path.normcase(name))
+        if key in self._ids:
+            return
+        entry = (key[0], name, is_dir)
+        if self._free:
+            entry_id = self._free.pop()
+            self._entries[entry_id] = entry
+        else:
+            entry_id = len(self._entries)
+            self._entries.append(entry)
+        self._ids[key] = entry_id
+        self._children[key[0]].add(entry_id)
+        for word in tokens(name):
+            if word not in self._postings:
+                self._vocabulary_stale = True
+            self._postings[word].add(entry_id)
+
+    def _remove(self, folder, name):
+        dir_id = self._dir_ids.get(os.path.normcase(folder))
+        entry_id = self._ids.pop((dir_id, os.path.normcase(name)), None) if dir_id is not None else None
+        if entry_id is None:
+            return
+        self._entries[entry_id] = None
+        self._children[dir_id].discard(entry_id)
+        self._free.append(entry_id)
+        for word in tokens(name):
+            postings = self._postings.get(word)
+            if postings is not None:
+                postings.discard(entry_id)
+                if not postings:
+                    del self._postings[word]
+                    self._vocabulary_stale = True
+
+    def add(self, path, is_dir=None):
+        """Adds a path, and everything in it if it is a folder; paths outside the roots are ignored."""
+        path = os.path.abspath(path)
+        root = self._root_of(path)
+        if root is None or path == root:
+            return
+        if any(_skipped(part) for part in os.path.relpath(os.path.dirname(path), root).split(os.sep) if part != "."):
+            return
+        if is_dir is None:
+            is_dir = os.path.isdir(path)
+        if is_dir and _skipped(os.path.basename(path)):
+            return
+        with self._lock:
+            self._add(os.path.dirname(path), os.path.basename(path), is_dir)
+            self.updates += 1
+        if is_dir:
+            self._walk(path)
+
+    def remove(self, path):
+        """Removes a path, and everything under it if it was a folder."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._remove(os.path.dirname(path), os.path.basename(path))
+            prefix = os.path.normcase(path) + os.sep
+            for key, dir_id in list(self._dir_ids.items()):
+                if key == os.path.normcase(path) or key.startswith(prefix):
+                    for entry_id in list(self._children[dir_id]):
+                        self._remove(self._dirs[dir_id], self._entries[entry_id][1])
+            self.updates += 1
+
+    def exists(self, path):
+        """Tells whether a file or folder exists, from the index when it covers the path and is kept current."""
+        path = os.path.abspath(path)
+        # Without file system events, entries can be stale
+        if not self.ready.is_set() or self._observer is None or self._root_of(path) is None:
+            return os.path.exists(path)
+        if path in self.roots:
+            return True
+        with self._lock:
+            dir_id = self._dir_ids.get(os.path.normcase(os.path.dirname(path)))
+            return dir_id is not None and (dir_id, os.path.normcase(os.path.basename(path))) in self._ids
+
+    def _words_like(self, word):
+        """Returns the indexed words that start with word or are spelled almost like it."""
+        if self._vocabulary_stale:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_stale = False
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, word)
+        similar = []
+        for candidate in vocabulary[start:]:
+            if not candidate.startswith(word):
+                break
+            similar.append(candidate)
+        if len(word) >= 4:
+            # Speech recognition misspells; only words with the same first letter are compared
+            first = bisect.bisect_left(vocabulary, word[0])
+            last = bisect.bisect_left(vocabulary, chr(ord(word[0]) + 1))
+            for candidate in vocabulary[first:last]:
+                if abs(len(candidate) - len(word)) <= 2 and not candidate.startswith(word):
+                    matcher = SequenceMatcher(None, word, candidate)
+                    if matcher.quick_ratio() >= 0.8 and matcher.ratio() >= 0.8:
+                        similar.append(candidate)
+        return similar
+
+    def find(self, query, limit=5, threshold=0.6, folders=None, shortlist=50):
+        """Returns the best matches for a spoken name as [{"path", "score", "is_dir"}], best first.
+
+        folders=True only returns folders, folders=False only files. Entries are first ranked
+        by how many of the query's words they contain, shorter names first, and only the best
+        shortlist of them are scored in full.
+        """
+        wanted = tokens(query)
+        if not wanted:
+            return []
+        with self._lock:
+            hits = Counter()
+            for word in wanted:
+                ids = set()
+                for similar in self._words_like(word):
+                    ids |= self._postings[similar]
+                hits.update(ids)
+            entries = self._entries
+            if folders is not None:
+                hits = Counter({entry_id: count for entry_id, count in hits.items() if entries[entry_id][2] == folders})
+            levels = defaultdict(list)
+            for entry_id, count in hits.items():
+                levels[count].append(entry_id)
+            candidates = []
+            for count in sorted(levels, reverse=True):
+                room = shortlist - len(candidates)
+                if room <= 0:
+                    break
+                level = levels[count]
+                candidates += level if len(level) <= room else heapq.nsmallest(room, level, key=lambda entry_id: len(entries[entry_id][1]))
+            results = []
+            for entry_id in candidates:
+                dir_id, name, is_dir = entries[entry_id]
+                stem = name if is_dir else os.path.splitext(name)[0]
+                score = token_set_similarity(query, stem)
+                if score >= threshold:
+                    results.append({"path": os.path.join(self._dirs[dir_id], name), "score": round(score, 3), "is_dir": is_dir})
+        results.sort(key=lambda result: (-result["score"], len(result["path"])))
+        if self._observer is None:
+            # Without file system events, entries can be stale
+            for result in [result for result in results[:limit] if not os.path.exists(result["path"])]:
+                self.remove(result["path"])
+                results.remove(result)
+        return results[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._ids), "folders": len(self._dirs), "words": len(self._postings),
+                    "build_s": round(self.build_seconds, 2) if self.build_seconds is not None else None,
+                    "updates": self.updates, "watching": self._observer is not None}
+
+
+def create_file_index():
+    """Returns a FileIndex over default_roots(), or one with no roots when ALFRED_INDEX=0."""
+    if os.getenv("ALFRED_INDEX", "1") == "0":
+        return FileIndex()
+    return FileIndex(default_roots())
@@ -0,0 +1,78 @@
+import os
+import re
+from difflib import SequenceMatcher
+
+# Words that say nothing about which element is meant
+STOP_WORDS = {"the", "a", "an", "on", "of", "to", "for", "and", "in", "link", "button", "page", "tab", "please"}
+
+# How much a match in each field of a page index entry counts
+FIELD_WEIGHTS = {"text": 1.0, "ariaLabel": 0.95, "title": 0.9, "alt": 0.85, "href": 0.7}
+
+# Links and buttons are what people mean by "click"; other clickables count a little less
+ROLE_WEIGHTS = {"a": 1.0, "button": 1.0, "input": 0.9}
+OTHER_ROLE_WEIGHT = 0.85
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def default_threshold():
+    return float(os.getenv("CLICK_MATCH_THRESHOLD", "0.6"))
+
+
+def tokens(text):
+    """Returns the set of meaningful lowercase words in text."""
+    return {word for word in _WORD.findall((text or "").lower()) if word not in STOP_WORDS}
+
+
+def _word_similarity(word, candidates):
+    if word in candidates:
+        return 1.0
+    best = 0.0
+    for candidate in candidates:
+        if candidate.startswith(word) or word.startswith(candidate):
+            # Plurals and words run together, e.g. "video" and "videos", "sign" and "signin"
+            score = 0.9 if min(len(word), len(candidate)) >= 3 else 0.0
+        else:
+            score = SequenceMatcher(None, word, candidate).ratio()
+            score = score if score >= 0.8 else 0.0
+        best = max(best, score)
+    return best
+
+
+def token_set_similarity(query, text):
+    """Scores from 0 to 1 how well the words of text cover the words of query.
+
+    Word order does not matter, near-miss spellings from speech recognition count partly,
+    and extra words in text only lower the score a little.
+    """
+    wanted, present = tokens(query), tokens(text)
+    if not wanted or not present:
+        return 0.0
+    matched = sum(_word_similarity(word, present) for word in wanted)
+    recall = matched / len(wanted)
+    precision = min(1.0, matched / len(present))
+    return 0.8 * recall + 0.2 * precision
+
+
+def rank(query, entries, threshold=None, limit=5):
+    """Ranks page index snapshot entries against query and returns the best ones above threshold.
+
+    Each result is {"entry", "score", "field"}, best first; ties keep document order.
+    """
+    threshold = default_threshold() if threshold is None else threshold
+    results = []
+    for entry in entries:
+        if not entry.get("visible"):
+            continue
+        best, best_field = 0.0, None
+        for field, weight in FIELD_WEIGHTS.items():
+            value = entry.get(field)
+            if value:
+                score = weight * token_set_similarity(query, value)
+                if score > best:
+                    best, best_field = score, field
+        score = best * (ROLE_WEIGHTS.get(entry.get("tag"), OTHER_ROLE_WEIGHT))
+        if score >= threshold:
+            results.append({"entry": entry, "score": round(score, 3), "field": best_field})
+    results.sort(key=lambda result: result["score"], reverse=True)
+    return results[:limit]
@@ -0,0 +1,253 @@
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+def is_retryable(error):
+    """Tells whether a failed request may succeed if sent again: timeouts, connection errors, 429 and 5xx.
+
+    google.api_core errors carry the HTTP status as code; an invalid key or a rejected
+    request fails the same way every time.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+
+class CircuitBreaker:
+    """Stops calling an unhealthy API for a while.
+
+    After failure_threshold calls in a row have failed the breaker opens and allow() refuses
+    every call for reset_timeout seconds. Then one trial call is let through, and its outcome
+    closes the breaker again or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_count = 0
+        self._opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.open_count += 1
+                self._opened_at = time.monotonic()
+                print(f"Gemini circuit breaker opened after {self.failures} failures")
+
+
+class GeminiClient:
+    """Calls a genai model with deadlines, jittered retries, optional hedging and a circuit breaker.
+
+    Every call runs on one event loop kept on a background thread, so the model's async
+    client and its connection are set up once and reused by every command. generate()
+    blocks its caller for at most deadline seconds and raises on failure; CircuitOpenError
+    means the API was not called at all.
+
+    Each attempt gets timeout seconds. With hedge_after set, an attempt that has not answered
+    after that many seconds is duplicated and the first answer wins. Only errors for which
+    is_retryable() is true are retried and count against the circuit breaker.
+    """
+
+    def __init__(self, model, timeout=4.0, deadline=8.0, retries=2, backoff=0.25, hedge_after=None, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.short_circuits = 0
+        self.requests = 0
+        self.loops_created = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cold_latency = None
+        self._latencies = deque(maxlen=200)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, **kwargs):
+        """Returns the model's response to prompt, or raises once the deadline or retries run out."""
+        self.calls += 1
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            raise CircuitOpenError("Gemini circuit breaker is open")
+        started = time.perf_counter()
+        loop, cold = self._get_loop()
+        future = asyncio.run_coroutine_threadsafe(self._generate(prompt, kwargs), loop)
+        try:
+            # The coroutine enforces the deadline itself; this only guards against a stuck loop
+            response = future.result(self.deadline + 1)
+        except Exception as e:
+            future.cancel()
+            self.failed += 1
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                # The API answered; the request itself was refused
+                self.breaker.record_success()
+            raise
+        self.succeeded += 1
+        self.breaker.record_success()
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_token_count or 0
+            self.output_tokens += usage.candidates_token_count or 0
+        elapsed = time.perf_counter() - started
+        if cold:
+            self.cold_latency = elapsed
+        else:
+            self._latencies.append(elapsed)
+        return response
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True).start()
+                self.loops_created += 1
+                return self._loop, True
+            return self._loop, False
+
+    async def _generate(self, prompt, kwargs):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                return await asyncio.wait_for(self._hedged(prompt, kwargs), min(self.timeout, remaining))
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                attempt += 1
+                # Exponential backoff with jitter, so retries from several commands do not line up
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                if not is_retryable(e) or attempt > self.retries or loop.time() + delay >= deadline:
+                    raise
+                self.retried += 1
+                print(f"Gemini attempt {attempt} failed ({e!r}), retrying in {delay:.2f} s")
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, prompt, kwargs):
+        if self.hedge_after is None:
+            return await self._request(prompt, kwargs)
+        first = asyncio.ensure_future(self._request(prompt, kwargs))
+        pending = {first}
+        error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return first.result()
+            self.hedges += 1
+            second = asyncio.ensure_future(self._request(prompt, kwargs))
+            pending.add(second)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Whatever is still running when the attempt ends or times out is abandoned
+            for task in pending:
+                task.cancel()
+
+    async def _request(self, prompt, kwargs):
+        self.requests += 1
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt, **kwargs)
+        # Models without an async API run on the loop's thread pool instead
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.model.generate_content, prompt, **kwargs))
+
+    def stats(self):
+        """Returns call outcomes, token usage, breaker state and how well the client and its connection are reused."""
+        latencies = sorted(self._latencies)
+        return {
+            "calls": self.calls,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "retries": self.retried,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "short_circuits": self.short_circuits,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.open_count,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_per_call": round((self.prompt_tokens + self.output_tokens) / self.succeeded, 1) if self.succeeded else 0,
+            "requests": self.requests,
+            "clients_created": self.loops_created,
+            "requests_per_client": round(self.requests / self.loops_created, 1) if self.loops_created else 0,
+            "cold_ms": round(self.cold_latency * 1000, 1) if self.cold_latency is not None else None,
+            "warm_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        }
+
+
+def create_client(model):
+    """Returns a GeminiClient for model configured from the GEMINI_* environment variables."""
+    hedge_after = os.getenv("GEMINI_HEDGE_AFTER")
+    return GeminiClient(
+        model,
+        timeout=float(os.getenv("GEMINI_TIMEOUT", "4")),
+        deadline=float(os.getenv("GEMINI_DEADLINE", "8")),
+        retries=int(os.getenv("GEMINI_RETRIES", "2")),
+        hedge_after=float(hedge_after) if hedge_after else None,
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", "3")),
+            reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET", "30")),
+        ),
+    )
@@ -0,0 +1,201 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Words that do not change what the user is asking for when they open or close an utterance
+FILLER_WORDS = {
+    "please", "um", "uh", "umm", "uhh", "hmm", "hey", "okay", "ok",
+    "alfred", "kindly", "just", "now",
+}
+FILLER_PHRASES = ["can you", "could you", "would you", "will you", "i want to", "i would like to"]
+# Fillers dropped from the end; "ok" or "now" there are more often part of the payload ("click on ok")
+TRAILING_FILLER_WORDS = {"please", "um", "uh", "umm", "uhh", "hmm"}
+
+
+# Sentence punctuation the recognizer puts around words
+_PUNCTUATION = ".,!?;:"
+
+
+def normalize_command(command):
+    """Normalizes a spoken command so equivalent utterances share a cache key.
+
+    Case, spacing, sentence punctuation and fillers are only dropped at the start and end;
+    the rest is kept as spoken, so "search just dance" and "search c++" keep their payload.
+    """
+    words = command.lower().split()
+    while words:
+        bare = [word.strip(_PUNCTUATION) for word in words[:4]]
+        phrase = next((phrase for phrase in FILLER_PHRASES if " ".join(bare[:len(phrase.split())]) == phrase), None)
+        if phrase is not None:
+            words = words[len(phrase.split()):]
+        elif not bare[0] or bare[0] in FILLER_WORDS:
+            words = words[1:]
+        else:
+            break
+    while words and (not words[-1].strip(_PUNCTUATION) or words[-1].strip(_PUNCTUATION) in TRAILING_FILLER_WORDS):
+        words = words[:-1]
+    if not words:
+        return ""
+    words[0] = words[0].lstrip(_PUNCTUATION)
+    words[-1] = words[-1].rstrip(_PUNCTUATION)
+    return " ".join(words)
+
+
+def as_spoken(command, text):
+    """Returns the part of command that normalize_command turned into text, in its original case."""
+    collapsed = " ".join(command.split())
+    lowered = collapsed.lower()
+    start = lowered.find(text)
+    # lower() can change the length of some non-ASCII text; the lowercased text is used then
+    if len(lowered) != len(collapsed) or start < 0:
+        return text
+    return collapsed[start:start + len(text)]
+
+
+def default_cache_path():
+    """Gets the path of the on-disk intent cache."""
+    return os.getenv("INTENT_CACHE_PATH") or os.path.join(os.path.expanduser("~"), ".alfred", "intent_cache.sqlite3")
+
+
+class IntentCache:
+    """Two-tier cache of parsed commands: an in-memory LRU in front of a SQLite store."""
+
+    def __init__(self, path=None, max_memory_entries=512, max_disk_entries=5000, ttl=7 * 24 * 3600):
+        self.path = path if path is not None else default_cache_path()
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS intents ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Intent cache disk store unavailable, using memory only: {e}")
+                self._db = None
+
+    def get(self, command):
+        """Returns a copy of the cached parse for a command, or None."""
+        key = normalize_command(command)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._memory[key]
+
+            entry = self._disk_get(key, now)
+            if entry is not None:
+                created, value = entry
+                self._memory_put(key, value, created)
+                self.hits += 1
+                self.disk_hits += 1
+                return copy.deepcopy(value)
+
+            self.misses += 1
+            return None
+
+    def put(self, command, parsed_result):
+        """Stores the parse for a command in both tiers."""
+        key = normalize_command(command)
+        if not key:
+            return
+        value = copy.deepcopy(parsed_result)
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, value, now)
+            self._disk_put(key, value, now)
+
+    def clear(self):
+        """Removes every cached entry."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM intents")
+                self._db.commit()
+
+    def stats(self):
+        """Returns hit/miss counters and the current tier sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_count(),
+            }
+
+    def _memory_put(self, key, value, created):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute("SELECT value, created FROM intents WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if now - created > self.ttl:
+                self._db.execute("DELETE FROM intents WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE intents SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return created, json.loads(value)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Intent cache read failed: {e}")
+            return None
+
+    def _disk_put(self, key, value, now):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO intents (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # Evict expired entries first, then the least recently used ones over the size limit
+            self._db.execute("DELETE FROM intents WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM intents WHERE key IN ("
+                "SELECT key FROM intents ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self._db.commit()
+        except (sqlite3.Error, TypeError) as e:
+            print(f"Intent cache write failed: {e}")
+
+    def _disk_count(self):
+        if self._db is None:
+            return 0
+        try:
+            return self._db.execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+        except sqlite3.Error:
+            return 0
@@ -0,0 +1,253 @@
+import re
+
+from intent_cache import as_spoken, normalize_command
+
+# Common website names mapped to their domains
+WEBSITE_MAP = {
+    "youtube": "youtube.com",
+    "google": "google.com",
+    "facebook": "facebook.com",
+    "twitter": "twitter.com",
+    "instagram": "instagram.com",
+    "linkedin": "linkedin.com",
+    "reddit": "reddit.com",
+    "amazon": "amazon.com",
+    "netflix": "netflix.com"
+}
+
+# Scroll targets the model sometimes returns instead of up/down/top/bottom
+SCROLLING_TARGETS = ["scroll_start", "scroll_stop", "scroll_top", "scroll_bottom",
+                     "start_scrolling", "stop_scrolling", "scroll_up", "scroll_down",
+                     "scrolling_start", "scrolling_stop"]
+
+ORDINAL_WORDS = ["first", "second", "third", "fourth", "fifth", "1st", "2nd", "3rd", "4th", "5th"]
+
+# Spoken tab counts, as in "close three tabs"
+COUNT_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+
+
+def normalize_scroll_target(target):
+    """Maps scroll target variants to down, up, top, bottom or stop."""
+    if target in SCROLLING_TARGETS:
+        if "start" in target or "down" in target:
+            return "down"
+        elif "stop" in target:
+            return "stop"
+        elif "top" in target:
+            return "top"
+        elif "bottom" in target:
+            return "bottom"
+        elif "up" in target:
+            return "up"
+    return target
+
+
+def _result(intent, target):
+    return {"intent": intent, "target": target, "parameters": {}}
+
+
+def plan_result(steps):
+    """Wraps parsed steps into a plan, or returns the step itself when there is only one."""
+    if len(steps) == 1:
+        return steps[0]
+    return {"intent": "plan", "target": None, "parameters": {"steps": steps}}
+
+
+def _open_website(match):
+    site = match.group("site")
+    if site in WEBSITE_MAP:
+        return _result("open_website", WEBSITE_MAP[site])
+    if re.fullmatch(r"(?:www\.)?[a-z0-9-]+(?:\.[a-z0-9-]+)+", site):
+        return _result("open_website", site)
+    # Unknown names are left to Gemini, which knows the right domain
+    return None
+
+
+def _click(match):
+    return _result("click", match.group("item"))
+
+
+def _close_tabs(match):
+    count = match.groupdict().get("count")
+    if count is not None:
+        return _result("close_tabs", str(COUNT_WORDS.get(count, count)))
+    site = match.group("site")
+    return _result("close_tabs", "all" if site in ("all", "every") else WEBSITE_MAP.get(site, site))
+
+
+def _search(match):
+    query = match.group("query")
+    # "search cats on youtube" means a site switch too, which only Gemini handles well
+    if re.search(r"\b(?:on|in|using) \w+(?:\.\w+)?$", query):
+        return None
+    return _result("search", query)
+
+
+_COUNT = rf"(?P<count>\d+|{'|'.join(COUNT_WORDS)})"
+
+_NUMBERED_ITEM = (
+    rf"(?P<item>(?:the )?(?:(?:{'|'.join(ORDINAL_WORDS)}|\d+(?:st|nd|rd|th)?) (?:result|link|video|one)"
+    r"|(?:result|link|video) number \d+))"
+)
+
+# Patterns grouped by first word, so each command is only tried against its own verb
+_PATTERNS = {
+    "exit": [(re.compile(r"exit(?: the)?(?: browser)?"), lambda m: _result("exit", "browser"))],
+    "quit": [(re.compile(r"quit(?: the)?(?: browser)?"), lambda m: _result("exit", "browser"))],
+    "close": [
+        (re.compile(r"close(?: the)? browser"), lambda m: _result("exit", "browser")),
+        (re.compile(r"close(?: this| the| the current)? tab"), lambda m: _result("close_tabs", "1")),
+        (re.compile(rf"close tabs {_COUNT}"), _close_tabs),
+        (re.compile(rf"close(?: the)?(?: last)? {_COUNT} tabs?"), _close_tabs),
+        (re.compile(r"close(?: all)?(?: the)? (?P<site>[a-z0-9.-]+) tabs?"), _close_tabs),
+    ],
+    "switch": [(re.compile(r"switch to(?: the)? (?P<name>.+?)(?: tab)?"), lambda m: _result("switch_tab", m.group("name")))],
+    "back": [(re.compile(r"back"), lambda m: _result("navigate", "back"))],
+    "forward": [(re.compile(r"forward"), lambda m: _result("navigate", "forward"))],
+    "go": [
+        (re.compile(r"go back(?: a page)?"), lambda m: _result("navigate", "back")),
+        (re.compile(r"go forward(?: a page)?"), lambda m: _result("navigate", "forward")),
+        (re.compile(r"go to(?: the)? (?P<dir>top|bottom)(?: of the page)?"), lambda m: _result("scroll", m.group("dir"))),
+        (re.compile(r"go to (?P<site>[a-z0-9.-]+)"), _open_website),
+    ],
+    "refresh": [(re.compile(r"refresh(?: the)?(?: page)?"), lambda m: _result("navigate", "refresh"))],
+    "reload": [(re.compile(r"reload(?: the)?(?: page)?"), lambda m: _result("navigate", "refresh"))],
+    "scroll": [
+        (re.compile(r"scroll (?P<dir>down|up)(?: a bit| more| again| now)?"), lambda m: _result("scroll", m.group("dir"))),
+        (re.compile(r"scroll to(?: the)? (?P<dir>top|bottom)(?: of the page)?"), lambda m: _result("scroll", m.group("dir"))),
+        (re.compile(r"(?P<dir>scroll_\w+)"), lambda m: _result("scroll", normalize_scroll_target(m.group("dir")))),
+    ],
+    "open": [
+        (re.compile(rf"open {_NUMBERED_ITEM}"), _click),
+        (re.compile(r"open (?P<site>[a-z0-9.-]+)"), _open_website),
+    ],
+    "visit": [(re.compile(r"visit (?P<site>[a-z0-9.-]+)"), _open_website)],
+    "play": [(re.compile(rf"play {_NUMBERED_ITEM}"), _click)],
+    "select": [(re.compile(rf"select {_NUMBERED_ITEM}"), _click)],
+    "choose": [(re.compile(rf"choose {_NUMBERED_ITEM}"), _click)],
+    "click": [(re.compile(r"click(?: on)? (?P<item>.+)"), _click)],
+    "search": [(re.compile(r"search(?: for)? (?P<query>.+)"), _search)],
+    "list": [
+        (re.compile(r"list(?: all)?(?: the)? (?:links|clickable elements)"), lambda m: _result("list", "links")),
+        (re.compile(r"list(?: all)?(?: the)?(?: open)? tabs"), lambda m: _result("list", "tabs")),
+    ],
+    "show": [
+        (re.compile(r"show(?: all)?(?: the)? (?:links|clickable elements)"), lambda m: _result("list", "links")),
+        (re.compile(r"show(?: all)?(?: the)?(?: open)? tabs"), lambda m: _result("list", "tabs")),
+    ],
+}
+
+
+# Groups holding what the user asked for, as opposed to the grammar's own keywords
+_PAYLOAD_GROUPS = {"query", "item", "name"}
+
+
+class _SpokenMatch:
+    """A match on the lowercased command whose payload groups are cut from the command as spoken."""
+
+    def __init__(self, match, spoken):
+        self._match = match
+        self._spoken = spoken
+
+    def group(self, name):
+        start, end = self._match.span(name)
+        if start < 0:
+            return None
+        return self._spoken[start:end] if name in _PAYLOAD_GROUPS else self._match.group(name)
+
+    def groupdict(self):
+        return {name: self.group(name) for name in self._match.groupdict()}
+
+
+def parse_command(command):
+    """Parses a command of the fixed browser grammar locally.
+
+    Returns the same {"intent", "target", "parameters"} dict as process_with_gemini,
+    or None when the command should go to Gemini instead. Commands are matched
+    lowercased, and search queries, click targets and tab names are returned as spoken.
+    """
+    text = normalize_command(command)
+    if not text:
+        return None
+    spoken = as_spoken(command, text)
+    for pattern, build in _PATTERNS.get(text.split()[0], []):
+        match = pattern.fullmatch(text)
+        if match:
+            return build(_SpokenMatch(match, spoken))
+    return None
+
+
+# Separators between the steps of a compound command like "open youtube, search lo-fi and play the first video"
+_STEP_SEPARATOR = re.compile(r"\s*,\s*(?:and\s+)?(?:then\s+)?|\s+and then\s+|\s+then\s+|\s+and\s+", re.IGNORECASE)
+
+
+def _step_spans(command):
+    """Returns the (start, end) of every non-empty part of command between step separators."""
+    spans, start = [], 0
+    for separator in _STEP_SEPARATOR.finditer(command):
+        spans.append((start, separator.start()))
+        start = separator.end()
+    spans.append((start, len(command)))
+    return [(start, end) for start, end in spans if command[start:end].strip()]
+
+
+def parse_plan(command):
+    """Parses a compound command whose every step is in the fixed browser grammar.
+
+    A separator can also belong to a step, as in "search tom and jerry and scroll down", so
+    parts are joined back together where needed and the split with the most steps is used.
+    Returns a plan {"intent": "plan", "parameters": {"steps": [...]}}, or None when no split
+    into two or more steps parses.
+    """
+    spans = _step_spans(command)
+    if len(spans) < 2:
+        return None
+    # best[i] holds the most steps found for the first i parts, or None if they do not parse
+    best = [[]] + [None] * len(spans)
+    for end in range(1, len(spans) + 1):
+        for start in range(end):
+            if best[start] is None or (best[end] is not None and len(best[start]) + 1 <= len(best[end])):
+                continue
+            step = parse_command(command[spans[start][0]:spans[end - 1][1]])
+            if step is not None:
+                best[end] = best[start] + [step]
+    steps = best[-1]
+    return plan_result(steps) if steps is not None and len(steps) >= 2 else None
+
+
+def parse_local(command):
+    """Parses a command, compound or not, in the fixed browser grammar, or returns None for Gemini.
+
+    When a later part of the command is a step of the grammar on its own but no split parses,
+    the command goes to Gemini rather than becoming one search or click that swallows that step.
+    """
+    plan = parse_plan(command)
+    if plan is not None:
+        return plan
+    if any(parse_command(command[start:end]) is not None for start, end in _step_spans(command)[1:]):
+        return None
+    return parse_command(command)
+
+
+def fallback_parse(command):
+    """Best-effort parse used while Gemini is unreachable.
+
+    Tries the fixed grammar from every word of the command, so "could you please scroll
+    down" still scrolls, then treats open/take me to a known site as opening it, and
+    anything else as a search.
+    """
+    text = normalize_command(command)
+    words = text.split()
+    if not words:
+        return _result("unknown", None)
+    spoken = as_spoken(command, text)
+    spoken_words = spoken.split()
+    for index, word in enumerate(words):
+        if word in _PATTERNS:
+            result = parse_command(" ".join(spoken_words[index:]))
+            if result is not None:
+                return result
+    sites = [word for word in words if word in WEBSITE_MAP]
+    if sites and {"open", "go", "take", "visit", "show"} & set(words):
+        return _result("open_website", WEBSITE_MAP[sites[0]])
+    return _result("search", spoken)
@@ -0,0 +1,223 @@
+# Page-scoped index of text-bearing and clickable elements.
+#
+# The index lives in the page as window.__alfredIndex. It is built by one scan when a
+# command first touches a new document, and a MutationObserver marks only the changed
+# nodes and added subtrees as dirty, so later queries re-read just those parts of the DOM.
+# Every query below is a single execute_script call that installs the index if needed.
+
+INDEX_JS = """
+if (!window.__alfredIndex || window.__alfredIndex.doc !== document) {
+    const CLICKABLE = 'a, button, input[type="button"], input[type="submit"], [role="button"]';
+    const ownText = el => {
+        let s = '';
+        for (const node of el.childNodes) {
+            if (node.nodeType === Node.TEXT_NODE) s += node.nodeValue;
+        }
+        return s.trim().toLowerCase();
+    };
+    const index = {
+        doc: document,
+        token: Math.random().toString(36).slice(2),
+        version: 1,
+        nextId: 1,
+        records: new Map(),
+        elements: new Map(),
+        dirtyNodes: new Set(),
+        dirtyTrees: new Set(),
+        ordered: null,
+        orderedVersion: 0,
+    };
+    index.add = el => {
+        const existing = index.records.get(el);
+        const own = ownText(el);
+        const title = el.getAttribute('title') || '';
+        const ariaLabel = el.getAttribute('aria-label') || '';
+        const alt = el.getAttribute('alt') || '';
+        const href = el.tagName === 'A' ? (el.getAttribute('href') || '') : '';
+        const clickable = el.matches(CLICKABLE);
+        if (!own && !title && !ariaLabel && !alt && !href && !clickable) {
+            if (existing) {
+                index.records.delete(el);
+                index.elements.delete(existing.id);
+            }
+            return;
+        }
+        const id = existing ? existing.id : index.nextId++;
+        index.records.set(el, {id: id, el: el, tag: el.tagName, own: own, title: title, ariaLabel: ariaLabel,
+                               alt: alt, href: href, role: el.getAttribute('role') || '', clickable: clickable});
+        index.elements.set(id, el);
+    };
+    index.scan = root => {
+        index.add(root);
+        const all = root.getElementsByTagName('*');
+        for (let i = 0; i < all.length; i++) index.add(all[i]);
+    };
+    index.refresh = () => {
+        if (index.dirtyNodes.size === 0 && index.dirtyTrees.size === 0) return;
+        for (const [el, record] of index.records) {
+            if (!el.isConnected) {
+                index.records.delete(el);
+                index.elements.delete(record.id);
+            }
+        }
+        const trees = new Set(Array.from(index.dirtyTrees).filter(el => el.isConnected));
+        for (const root of trees) {
+            // A subtree inside another dirty subtree is covered by the outer scan
+            let parent = root.parentElement;
+            while (parent && !trees.has(parent)) parent = parent.parentElement;
+            if (!parent) index.scan(root);
+        }
+        for (const el of index.dirtyNodes) {
+            if (el.isConnected) index.add(el);
+        }
+        index.dirtyNodes.clear();
+        index.dirtyTrees.clear();
+    };
+    index.sorted = () => {
+        if (index.orderedVersion !== index.version) {
+            index.ordered = Array.from(index.records.values()).sort((a, b) =>
+                a.el === b.el ? 0 : (a.el.compareDocumentPosition(b.el) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1));
+            index.orderedVersion = index.version;
+        }
+        return index.ordered;
+    };
+    index.visible = el => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    index.enabled = el => !el.disabled && getComputedStyle(el).pointerEvents !== 'none';
+    index.layout = r => {
+        const rect = r.el.getBoundingClientRect();
+        return {rect: [Math.round(rect.left + scrollX), Math.round(rect.top + scrollY),
+                       Math.round(rect.width), Math.round(rect.height)],
+                visible: index.visible(r.el)};
+    };
+    // Visibility and position also change through CSS and class changes the observer does not
+    // watch, so they are read again every time; only the unchanged text is left out
+    index.snapshot = (token, version) => {
+        const clickable = index.sorted().filter(r => r.clickable);
+        if (token === index.token && version === index.version) {
+            return {token: index.token, version: index.version, entries: null, layout: clickable.map(index.layout)};
+        }
+        const entries = clickable.map(r => Object.assign(
+            {id: r.id, tag: r.tag.toLowerCase(), text: (r.el.innerText || '').trim().slice(0, 200),
+             title: r.title, ariaLabel: r.ariaLabel, href: r.href ? r.el.href : '', alt: r.alt, role: r.role},
+            index.layout(r)));
+        return {token: index.token, version: index.version, entries: entries};
+    };
+    // Ranks records by the tiers of the old XPath click strategies: site-specific result
+    // links, own text, title, aria-label, href, alt, then enclosing link/button. Partial matches
+    // are left to the fuzzy matcher in Python.
+    index.resolve = (text, site, limit) => {
+        const lower = s => (s || '').toLowerCase();
+        const headingMatch = (el, tag) => Array.from(el.getElementsByTagName(tag)).some(h => ownText(h).includes(text));
+        const matches = [];
+        for (const r of index.sorted()) {
+            const el = r.el;
+            let tier = -1;
+            if (r.tag === 'A' && site === 'google') {
+                const content = lower(el.textContent);
+                if (headingMatch(el, 'h3')) tier = 0;
+                else if (content.includes(text) && el.closest('div[class*="g"]')) tier = 1;
+                else if (content.includes(text) && el.parentElement && el.parentElement.matches('div[class*="yuRUbf"]')) tier = 2;
+            } else if (r.tag === 'A' && site === 'bing') {
+                if (headingMatch(el, 'h2')) tier = 0;
+                else if (lower(el.textContent).includes(text) && el.closest('li[class*="b_algo"]')) tier = 1;
+            }
+            if (tier < 0) {
+                if (r.own.includes(text)) tier = 3;
+                else if (lower(r.title).includes(text)) tier = 6;
+                else if (lower(r.ariaLabel).includes(text)) tier = 7;
+                else if (lower(r.href).includes(text)) tier = 8;
+                else if (lower(r.alt).includes(text)) tier = 9;
+                else if ((r.tag === 'A' || r.tag === 'BUTTON') && lower(el.textContent).includes(text)) tier = r.tag === 'A' ? 10 : 11;
+            }
+            if (tier < 0 || !index.visible(el)) continue;
+            if (tier < 3 && !index.enabled(el)) continue;
+            matches.push({element: el, id: r.id, tier: tier, order: matches.length});
+        }
+        matches.sort((a, b) => a.tier - b.tier || a.order - b.order);
+        return matches.slice(0, limit).map(m => ({element: m.element, id: m.id, tier: m.tier}));
+    };
+    // Returns the nth visible record matching the first selector that has at least n matches
+    index.nth = (selectors, n) => {
+        for (const [selector, label] of selectors) {
+            let found;
+            try {
+                found = index.sorted().filter(r => r.el.matches(selector) && index.visible(r.el) && index.enabled(r.el));
+            } catch (e) {
+                continue;
+            }
+            if (found.length >= n) return {element: found[n - 1].el, id: found[n - 1].id, label: label, selector: selector};
+        }
+        return null;
+    };
+    index.element = id => {
+        const el = index.elements.get(id);
+        if (el && el.isConnected) el.scrollIntoView({block: 'center'});
+        return el && el.isConnected ? el : null;
+    };
+    index.observer = new MutationObserver(mutations => {
+        for (const m of mutations) {
+            if (m.type === 'childList') {
+                index.dirtyNodes.add(m.target);
+                for (const node of m.addedNodes) {
+                    if (node.nodeType === Node.ELEMENT_NODE) index.dirtyTrees.add(node);
+                }
+            } else if (m.type === 'characterData') {
+                if (m.target.parentElement) index.dirtyNodes.add(m.target.parentElement);
+            } else {
+                index.dirtyNodes.add(m.target);
+            }
+        }
+        index.version++;
+    });
+    index.observer.observe(document, {subtree: true, childList: true, characterData: true, attributes: true,
+                                      attributeFilter: ['title', 'aria-label', 'alt', 'href', 'role', 'type']});
+    if (document.body) index.scan(document.body);
+    window.__alfredIndex = index;
+}
+const index = window.__alfredIndex;
+index.refresh();
+"""
+
+
+class PageIndex:
+    """Python side of the in-page element index, caching the last snapshot."""
+
+    def __init__(self):
+        self._token = None
+        self._version = None
+        self._entries = []
+
+    def _call(self, driver, expression, *args):
+        return driver.execute_script(INDEX_JS + expression, *args)
+
+    def snapshot(self, driver):
+        """Returns the clickable entries of the current page, reusing the last copy if nothing changed.
+
+        The text of a reused copy is kept, but its rect and visible fields are always current.
+        """
+        result = self._call(driver, "return index.snapshot(arguments[0], arguments[1]);", self._token, self._version)
+        if result["entries"] is not None:
+            self._entries = result["entries"]
+        else:
+            for entry, layout in zip(self._entries, result["layout"]):
+                entry.update(layout)
+        self._token = result["token"]
+        self._version = result["version"]
+        return self._entries
+
+    def resolve(self, driver, text, site="", limit=10):
+        """Returns up to limit ranked click candidates for the given lowercase text."""
+        return self._call(driver, "return index.resolve(arguments[0], arguments[1], arguments[2]);", text, site, limit)
+
+    def nth(self, driver, selectors, number):
+        """Returns the nth match of the first (selector, label) pair with enough matches, or None."""
+        return self._call(driver, "return index.nth(arguments[0], arguments[1]);", [list(s) for s in selectors], number)
+
+    def element(self, driver, entry_id):
+        """Scrolls an indexed element into view and returns it, or None if it is gone."""
+        return self._call(driver, "return index.element(arguments[0]);", entry_id)
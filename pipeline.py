@@ -0,0 +1,105 @@
+import threading
+
+from command_queue import CommandQueue, BLOCK
+
+
+class Stage:
+    """One step of a Pipeline: worker threads that read a queue, call a function, and feed the next queue."""
+
+    def __init__(self, name, function, source, output, workers, key, tracer, on_error):
+        self.name = name
+        self.function = function
+        self.source = source
+        self.output = output
+        self.workers = workers
+        self.key = key
+        self.tracer = tracer
+        self.on_error = on_error
+        self.processed = 0
+        self.failed = 0
+        # Workers still reading the source; the last one to stop closes the output
+        self._running = workers
+        self._lock = threading.Lock()
+
+    def run(self):
+        try:
+            self._work()
+        finally:
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last:
+                self.output.close()
+
+    def _work(self):
+        while True:
+            command = self.source.get()
+            if command is None:
+                return
+            trace = command.context
+            if self.tracer is not None:
+                if trace is None:
+                    trace = self.tracer.start()
+                else:
+                    self.tracer.add_span(trace, f"queue.{self.source.name}", command.age())
+            try:
+                if self.tracer is not None:
+                    with self.tracer.use(trace), self.tracer.span(self.name):
+                        result = self.function(command.value)
+                else:
+                    result = self.function(command.value)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error in {self.name} stage: {e}")
+                if self.on_error:
+                    self.on_error(e)
+                continue
+            if result is None:
+                continue
+            key = self.key(result) if self.key else None
+            queued = self.output.put(result, key=key, context=trace)
+            # A command merged into one already waiting ends here
+            if queued is not None and queued.context is not trace and self.tracer is not None:
+                self.tracer.finish(trace, "coalesced")
+
+
+class Pipeline:
+    """Chain of stages connected by bounded queues, so every stage works on a different command at once.
+
+    While one command is executing, the next can be recognized and parsed. Each stage function
+    takes the value produced by the previous stage and returns the value for the next one, or
+    None to stop that command there. The last queue, self.output, is read by the caller.
+    """
+
+    def __init__(self, source, tracer=None):
+        self.source = source
+        self.output = source
+        self.tracer = tracer
+        self.stages = []
+
+    def add_stage(self, name, function, workers=1, maxsize=16, policy=BLOCK, max_age=None, key=None, on_error=None):
+        """Appends a stage; key(result) can return a value that merges repeated results waiting in its queue."""
+        output = CommandQueue(maxsize=maxsize, policy=policy, max_age=max_age, name=name)
+        self.stages.append(Stage(name, function, self.output, output, workers, key, self.tracer, on_error))
+        self.output = output
+        return self
+
+    def start(self):
+        for stage in self.stages:
+            for index in range(stage.workers):
+                threading.Thread(target=stage.run, name=f"{stage.name}-{index}", daemon=True).start()
+        return self
+
+    def cancel_pending(self):
+        """Drops every command waiting between stages and returns how many were dropped."""
+        return sum(stage.output.cancel_pending() for stage in self.stages)
+
+    def close(self):
+        self.source.close()
+        for stage in self.stages:
+            stage.output.close()
+
+    def stats(self):
+        return {stage.name: {"processed": stage.processed, "failed": stage.failed, **stage.output.stats()}
+                for stage in self.stages}
@@ -0,0 +1,265 @@
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import time
+
+import speech_recognition as sr
+
+
+class RecognizerBackend:
+    """A speech-to-text engine.
+
+    recognize() turns a finished sr.AudioData into text and raises sr.UnknownValueError or
+    sr.RequestError like the speech_recognition engines do. Backends that can listen while
+    the user is still talking return a session from start_stream().
+    """
+
+    name = "base"
+
+    def recognize(self, audio):
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate, sample_width):
+        """Returns a StreamSession for live audio, or None if partial results are not supported."""
+        return None
+
+
+class StreamSession:
+    """Live recognition of one utterance: feed() returns partial text, finish() the final text."""
+
+    def feed(self, data):
+        return None
+
+    def finish(self):
+        return ""
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API; needs the network and answers only after the whole utterance."""
+
+    name = "google"
+
+    def __init__(self, language="en-US"):
+        self.language = language
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, audio):
+        return self._recognizer.recognize_google(audio, language=self.language)
+
+
+class SphinxBackend(RecognizerBackend):
+    """CMU PocketSphinx through speech_recognition; offline, needs the pocketsphinx package."""
+
+    name = "sphinx"
+
+    def __init__(self):
+        # Checked here rather than on first use, so create_backend can fall back to Google
+        if importlib.util.find_spec("pocketsphinx") is None:
+            raise sr.RequestError("the pocketsphinx package is not installed; pip install pocketsphinx")
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, audio):
+        return self._recognizer.recognize_sphinx(audio)
+
+
+class VoskBackend(RecognizerBackend):
+    """Vosk (Kaldi) running locally on the CPU, with partial results while audio streams in.
+
+    Needs the vosk package and a model directory from VOSK_MODEL_PATH.
+    """
+
+    name = "vosk"
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_path=None):
+        try:
+            import vosk
+        except ImportError:
+            raise sr.RequestError("the vosk package is not installed; pip install vosk")
+        model_path = model_path or os.getenv("VOSK_MODEL_PATH")
+        if not model_path or not os.path.isdir(model_path):
+            raise sr.RequestError("VOSK_MODEL_PATH must point to a downloaded Vosk model")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self._model = vosk.Model(model_path)
+
+    def recognize(self, audio):
+        recognizer = self._vosk.KaldiRecognizer(self._model, self.SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def start_stream(self, sample_rate, sample_width):
+        return VoskStreamSession(self._vosk.KaldiRecognizer(self._model, sample_rate), sample_width)
+
+
+class VoskStreamSession(StreamSession):
+    def __init__(self, recognizer, sample_width):
+        self._recognizer = recognizer
+        self._sample_width = sample_width
+        self._done = []
+
+    def feed(self, data):
+        if self._sample_width != 2:
+            data = sr.AudioData(data, 16000, self._sample_width).get_raw_data(convert_width=2)
+        if self._recognizer.AcceptWaveform(data):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._done.append(text)
+            return " ".join(self._done) or None
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(self._done + [partial]).strip() or None
+
+    def finish(self):
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return " ".join(self._done + [text]).strip()
+
+
+class ReplayBackend(RecognizerBackend):
+    """Returns known transcripts for recorded WAV files, for tests and benchmarks.
+
+    Every name.wav in the directory needs a name.txt with what was said. Audio is matched by
+    the hash of its samples, so load_wav() of the same file always recognizes the same way.
+    Partial results are the transcript revealed one word at a time.
+    """
+
+    name = "replay"
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.getenv("ASR_REPLAY_DIR", "recordings")
+        self._transcripts = {}
+        for wav_path in sorted(glob.glob(os.path.join(self.directory, "*.wav"))):
+            text_path = os.path.splitext(wav_path)[0] + ".txt"
+            if os.path.exists(text_path):
+                with open(text_path) as f:
+                    self._transcripts[audio_hash(load_wav(wav_path))] = f.read().strip()
+
+    def recognize(self, audio):
+        text = self._transcripts.get(audio_hash(audio))
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def partials(self, audio):
+        """Yields the growing partial hypotheses for a recorded utterance."""
+        words = self.recognize(audio).split()
+        for count in range(1, len(words) + 1):
+            yield " ".join(words[:count])
+
+    def recordings(self):
+        """Returns (audio, transcript) pairs for every recording in the directory."""
+        pairs = []
+        for wav_path in sorted(glob.glob(os.path.join(self.directory, "*.wav"))):
+            audio = load_wav(wav_path)
+            text = self._transcripts.get(audio_hash(audio))
+            if text:
+                pairs.append((audio, text))
+        return pairs
+
+
+def audio_hash(audio):
+    return hashlib.sha1(audio.get_raw_data()).hexdigest()
+
+
+def load_wav(path):
+    """Reads a WAV file into sr.AudioData."""
+    recognizer = sr.Recognizer()
+    with sr.AudioFile(path) as source:
+        return recognizer.record(source)
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "sphinx": SphinxBackend,
+    "vosk": VoskBackend,
+    "replay": ReplayBackend,
+}
+
+
+def create_backend(name=None):
+    """Creates the backend named by name or ASR_BACKEND (default google).
+
+    Falls back to Google when an offline backend cannot be loaded on this machine.
+    """
+    name = (name or os.getenv("ASR_BACKEND", "google")).lower()
+    if name not in BACKENDS:
+        print(f"Unknown speech recognition backend '{name}', using google")
+        name = "google"
+    try:
+        return BACKENDS[name]()
+    except sr.RequestError as e:
+        print(f"Could not load the {name} backend ({e}), using google")
+        return GoogleBackend()
+
+
+def recognize_segment(backend, audio):
+    """Recognizes a captured segment, reusing the text if it was already streamed."""
+    text = getattr(audio, "streamed_text", None)
+    if text:
+        return text
+    if text == "":
+        raise sr.UnknownValueError()
+    return backend.recognize(audio)
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length."""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    distances = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, distances[0] = distances[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, distances[j] = distances[j], min(distances[j] + 1, distances[j - 1] + 1, previous + (ref_word != hyp_word))
+    return distances[len(hyp)] / len(ref) if ref else float(bool(hyp))
+
+
+def compare_backends(audio, backends, reference=None):
+    """Runs every backend on the same audio and returns text, latency and word error rate for each."""
+    results = []
+    for backend in backends:
+        started = time.perf_counter()
+        try:
+            text, error = backend.recognize(audio), None
+        except (sr.UnknownValueError, sr.RequestError) as e:
+            text, error = "", str(e) or type(e).__name__
+        result = {"backend": backend.name, "text": text, "latency": time.perf_counter() - started, "error": error}
+        if reference is not None:
+            result["wer"] = word_error_rate(reference, text)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare speech recognition backends on recorded WAV files.")
+    parser.add_argument("files", nargs="+", help="WAV files; a .txt next to each is used as the reference")
+    parser.add_argument("--backends", default="google,vosk,sphinx", help="comma-separated backend names")
+    args = parser.parse_args()
+
+    backends = []
+    for name in args.backends.split(","):
+        try:
+            backends.append(BACKENDS[name.strip()]())
+        except (KeyError, sr.RequestError) as e:
+            print(f"Skipping backend {name}: {e}")
+
+    for path in args.files:
+        text_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(text_path):
+            with open(text_path) as f:
+                reference = f.read().strip()
+        print(f"{path}" + (f" (reference: {reference!r})" if reference else ""))
+        for result in compare_backends(load_wav(path), backends, reference):
+            wer = f" WER {result['wer']:.0%}" if "wer" in result else ""
+            outcome = result["text"] if result["error"] is None else f"<{result['error']}>"
+            print(f"  {result['backend']:>8}: {result['latency'] * 1000:7.0f} ms{wer}  {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+class Route:
+    """A handler registered for one intent, with what to say while it runs."""
+
+    def __init__(self, intent, handler, acknowledgement=None):
+        self.intent = intent
+        self.handler = handler
+        self.acknowledgement = acknowledgement
+
+
+class Router:
+    """Dispatch table from intent names to handlers.
+
+    A handler is called as handler(command, count) with the parsed command dict
+    ({"intent", "target", "parameters"}) and how many repeats of it were merged. Intents
+    without a handler go to fallback, if one is registered.
+    """
+
+    def __init__(self, fallback=None):
+        self.routes = {}
+        self.fallback = fallback
+
+    def register(self, intent, handler, acknowledgement=None):
+        self.routes[intent] = Route(intent, handler, acknowledgement)
+        return self
+
+    def handles(self, intent):
+        return intent in self.routes
+
+    def route(self, command):
+        """Returns the Route for a parsed command, or None if nothing handles it."""
+        route = self.routes.get(command.get("intent"))
+        if route is None and self.fallback is not None:
+            return Route(command.get("intent"), self.fallback)
+        return route
+
+    def dispatch(self, command, count=1):
+        """Runs the handler for a parsed command and returns its result."""
+        route = self.route(command)
+        if route is None:
+            raise KeyError(f"No handler for intent {command.get('intent')!r}")
+        return route.handler(command, count)
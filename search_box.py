@@ -0,0 +1,69 @@
+import time
+
+# Evaluates every candidate selector in one pass and returns the first usable search box.
+# With a query it also fills the box in and submits its form in the same call, the way
+# pressing Enter would, so most searches take a single round trip.
+SEARCH_BOX_JS = """
+const [selectors, query] = arguments;
+const SKIPPED_TYPES = ['hidden', 'submit', 'button', 'checkbox', 'radio', 'image', 'file', 'reset'];
+const usable = el => {
+    if (el.disabled || el.readOnly || SKIPPED_TYPES.includes((el.type || '').toLowerCase())) return false;
+    const rect = el.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0) return false;
+    const style = getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none' && style.pointerEvents !== 'none';
+};
+for (const selector of selectors) {
+    let found;
+    try {
+        found = document.querySelectorAll(selector);
+    } catch (e) {
+        continue;
+    }
+    for (const el of found) {
+        if (!usable(el)) continue;
+        if (query === null) return {element: el, selector: selector, submitted: false};
+        el.focus();
+        // The native setter makes frameworks that track the value themselves see the change
+        const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, query);
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        if (el.form) {
+            if (el.form.requestSubmit) el.form.requestSubmit();
+            else el.form.submit();
+            return {element: el, selector: selector, submitted: true};
+        }
+        return {element: el, selector: selector, submitted: false};
+    }
+}
+return null;
+"""
+
+# Tried after any site-specific selectors, most specific first
+GENERIC_SEARCH_SELECTORS = [
+    "input[type='search']",
+    "[role='searchbox']",
+    "input[name='q']",
+    "textarea[name='q']",
+    "input[name='search']",
+    "input[placeholder*='search' i]",
+    "input[aria-label*='search' i]",
+    "input[class*='search' i]",
+    "input[id*='search' i]",
+]
+
+
+def find_search_box(driver, selectors, query=None, timeout=1.5, interval=0.1):
+    """Finds the first usable search box matching selectors, in order, within timeout seconds.
+
+    With a query the box is filled in and, if it belongs to a form, submitted in the same
+    call. Returns {"element", "selector", "submitted"}, or None if no box turned up in time;
+    when submitted is False the caller still has to press Enter in the element.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        found = driver.execute_script(SEARCH_BOX_JS, list(selectors), query)
+        if found is not None or time.monotonic() >= deadline:
+            return found
+        time.sleep(interval)
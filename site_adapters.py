@@ -0,0 +1,180 @@
+import atexit
+import json
+import os
+import threading
+from urllib.parse import urlparse
+
+
+class SiteAdapter:
+    """What the assistant knows about one site: its search box and its result links.
+
+    result_selectors are (css, label) pairs tried in order to find the nth result; name is
+    also passed to the page index so it can rank the site's result links first.
+    """
+
+    def __init__(self, name, title, hosts, search_selectors=(), result_selectors=()):
+        self.name = name
+        self.title = title
+        self.hosts = hosts
+        self.search_selectors = list(search_selectors)
+        self.result_selectors = list(result_selectors)
+
+    def __repr__(self):
+        return f"SiteAdapter({self.name!r})"
+
+
+# Used for every site without an adapter of its own
+GENERIC_ADAPTER = SiteAdapter("", "", [])
+
+ADAPTERS = [
+    SiteAdapter("google", "Google", ["google.com"],
+                search_selectors=["textarea[name='q']", "input[name='q']"],
+                result_selectors=[("div[class='g'] a", "result"), ("a:has(> h3)", "result")]),
+    SiteAdapter("bing", "Bing", ["bing.com"],
+                search_selectors=["textarea[name='q']", "input[name='q']"],
+                result_selectors=[("li[class='b_algo'] h2 > a", "result")]),
+    SiteAdapter("youtube", "YouTube", ["youtube.com", "m.youtube.com"],
+                search_selectors=["input[name='search_query']"],
+                result_selectors=[("ytd-video-renderer a#thumbnail", "video"), ("ytm-video-with-context-renderer a", "video")]),
+]
+
+_adapters_by_host = {}
+
+
+def register(adapter):
+    """Adds an adapter for its hosts, replacing any adapter registered for the same host."""
+    for host in adapter.hosts:
+        _adapters_by_host[host] = adapter
+
+
+for _adapter in ADAPTERS:
+    register(_adapter)
+
+
+def domain_of(url):
+    """Returns the hostname of url without a leading www., or "" for about:blank and the like."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def adapter_for(url):
+    """Returns the adapter for url's host or its closest registered parent domain."""
+    labels = domain_of(url).split(".")
+    for index in range(len(labels) - 1):
+        adapter = _adapters_by_host.get(".".join(labels[index:]))
+        if adapter is not None:
+            return adapter
+    return GENERIC_ADAPTER
+
+
+def default_cache_path():
+    """Returns SELECTOR_CACHE_PATH, or ~/.alfred/selector_cache.json when it is unset."""
+    path = os.getenv("SELECTOR_CACHE_PATH")
+    if path is not None:
+        return path
+    directory = os.path.join(os.path.expanduser("~"), ".alfred")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "selector_cache.json")
+
+
+class SelectorCache:
+    """Remembers which selector last worked for each kind of lookup on each domain.
+
+    order() puts the learned selector first, so a repeat action on a site succeeds on the
+    first try. A lookup is a hit when the learned selector is the one that worked again.
+    Entries are written to a JSON file save_delay seconds after a change, off the command's
+    thread, and on exit; path="" keeps them in memory only.
+    """
+
+    def __init__(self, path=None, save_delay=5.0):
+        self.path = default_cache_path() if path is None else path
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+        if self.path:
+            atexit.register(self.flush)
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Could not read selector cache: {e}")
+
+    def learned(self, domain, kind):
+        with self._lock:
+            entry = self._entries.get(domain, {}).get(kind)
+            return entry["selector"] if entry else None
+
+    def order(self, domain, kind, selectors):
+        """Returns selectors with the learned one first; items may be css strings or (css, label) pairs."""
+        learned = self.learned(domain, kind)
+        if learned is None:
+            return list(selectors)
+        css = lambda item: item[0] if isinstance(item, (tuple, list)) else item
+        first = [item for item in selectors if css(item) == learned]
+        if not first:
+            # Learned from a candidate no longer in the list, such as an older adapter
+            label = next((item[1] for item in selectors if isinstance(item, (tuple, list))), None)
+            first = [(learned, label)] if label is not None else [learned]
+        return first + [item for item in selectors if css(item) != learned]
+
+    def record(self, domain, kind, selector):
+        """Notes that selector worked for kind on domain; the cache is saved shortly after."""
+        if not domain:
+            return
+        with self._lock:
+            entry = self._entries.setdefault(domain, {}).get(kind)
+            if entry is not None and entry["selector"] == selector:
+                entry["hits"] += 1
+                self.hits += 1
+            else:
+                if entry is not None:
+                    self.misses += 1
+                self._entries[domain][kind] = {"selector": selector, "hits": 0,
+                                               "uses": entry["uses"] if entry else 0}
+                entry = self._entries[domain][kind]
+            entry["uses"] += 1
+            if not self.path:
+                return
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Writes the cache to its file if it changed since the last write."""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data = json.dumps(self._entries, indent=2)
+            try:
+                temporary = self.path + ".tmp"
+                with open(temporary, "w") as f:
+                    f.write(data)
+                os.replace(temporary, self.path)
+            except OSError as e:
+                print(f"Could not write selector cache: {e}")
+
+    def stats(self):
+        """Returns this session's hits and misses and the lifetime hit rate of every entry."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "domains": len(self._entries),
+                "entries": {f"{domain}/{kind}": round(entry["hits"] / entry["uses"], 3)
+                            for domain, kinds in self._entries.items() for kind, entry in kinds.items()},
+            }
@@ -0,0 +1,221 @@
+import array
+import importlib.util
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import speech_recognition as sr
+
+import speech_worker
+from audio_capture import chunk_energy
+from fuzzy_match import token_set_similarity
+from intent_cache import normalize_command
+
+try:
+    import numpy
+except ImportError:  # spectral check is skipped; energy and zero crossings still apply
+    numpy = None
+
+# Voice puts most of its energy in the telephone band, and crosses zero far less often than hiss or clicks
+SPEECH_BAND = (300, 3400)
+MIN_SPEECH_BAND_RATIO = 0.5
+CROSSINGS_PER_SECOND = (50, 4000)
+
+
+def frame_features(audio, frame_seconds=0.03):
+    """Yields (energy, zero crossings per second, speech band energy ratio) for each frame of a segment.
+
+    The ratio is None without numpy. Only 8 and 16 bit audio is analysed.
+    """
+    rate, width = audio.sample_rate, audio.sample_width
+    if width not in (1, 2):
+        return
+    data = audio.get_raw_data()
+    size = int(rate * frame_seconds) * width
+    window = numpy.hanning(size // width) if numpy is not None else None
+    frequencies = numpy.fft.rfftfreq(size // width, 1 / rate) if numpy is not None else None
+    for offset in range(0, len(data) - size + 1, size):
+        frame = data[offset:offset + size]
+        if numpy is not None:
+            samples = numpy.frombuffer(frame, dtype=numpy.int16 if width == 2 else numpy.int8).astype(numpy.float64)
+            energy = math.sqrt(float(numpy.mean(samples * samples)))
+            crossings = int(numpy.count_nonzero(numpy.diff(numpy.signbit(samples))))
+            power = numpy.abs(numpy.fft.rfft(samples * window)) ** 2
+            total = float(power[frequencies >= 80].sum())
+            in_band = float(power[(frequencies >= SPEECH_BAND[0]) & (frequencies <= SPEECH_BAND[1])].sum())
+            ratio = in_band / total if total else 0.0
+        else:
+            samples = array.array("h", frame) if width == 2 else array.array("b", frame)
+            energy = chunk_energy(frame, width)
+            crossings = sum(1 for a, b in zip(samples, samples[1:]) if (a < 0) != (b < 0))
+            ratio = None
+        yield energy, crossings / frame_seconds, ratio
+
+
+class SpeechGate:
+    """Decides on the device which captured segments are sent to the recognizer.
+
+    A segment is held back when the assistant was talking for more than self_speech of its
+    speech (from the first to the last loud chunk), when too little of it sounds like voice
+    (voice activity detection: frames above the capture's energy threshold with a speech-like zero-crossing rate and, with numpy, most
+    of their energy in the speech band, adding up to min_voiced seconds with one run of at
+    least min_run seconds), or, when a wake phrase is set, when local recognition heard
+    something other than the wake phrase.
+
+    Without a local recognizer the wake phrase is checked on the recognized text instead,
+    which still keeps stray speech from becoming a command. Saying the wake phrase keeps
+    the assistant listening without it for wake_window seconds. Recognized text is dropped
+    as an echo when the assistant was talking for at least echo_overlap of the speech and the
+    text repeats a phrase that was playing, so a command repeated after its acknowledgement
+    has finished still goes through.
+    """
+
+    def __init__(self, vad=True, min_voiced=0.2, min_run=0.09, wake_phrase=None, wake_window=8,
+                 self_speech=0.8, echo_overlap=0.5):
+        self.vad = vad
+        self.min_voiced = min_voiced
+        self.min_run = min_run
+        # Not normalize_command, which drops "alfred" and "hey" as filler words
+        self.wake_phrase = " ".join(re.findall(r"[a-z0-9']+", wake_phrase.lower())) if wake_phrase else None
+        self.wake_window = wake_window
+        self.self_speech = self_speech
+        self.echo_overlap = echo_overlap
+        self.forwarded = 0
+        self.gated = Counter()
+        self.dropped = Counter()
+        self._awake_until = 0.0
+        self._lock = threading.Lock()
+        self._wake_pattern = None
+        self._spotter = None
+        if self.wake_phrase:
+            self._wake_pattern = re.compile(rf"^\W*(?:(?:hey|ok|okay)\s+)?{re.escape(self.wake_phrase)}\b\W*")
+            # PocketSphinx can spot the wake phrase offline; looking for it does not import it
+            if importlib.util.find_spec("pocketsphinx") is not None:
+                self._spotter = sr.Recognizer()
+
+    def awake(self):
+        return time.monotonic() < self._awake_until
+
+    def voiced(self, audio):
+        """Returns (seconds of voiced frames, seconds of the longest voiced run) in a segment."""
+        threshold = getattr(audio, "energy_threshold", 300)
+        frame_seconds = 0.03
+        voiced = run = longest = 0
+        for energy, crossings, ratio in frame_features(audio, frame_seconds):
+            if (energy > threshold and CROSSINGS_PER_SECOND[0] <= crossings <= CROSSINGS_PER_SECOND[1]
+                    and (ratio is None or ratio >= MIN_SPEECH_BAND_RATIO)):
+                voiced += 1
+                run += 1
+                longest = max(longest, run)
+            else:
+                run = 0
+        return voiced * frame_seconds, longest * frame_seconds
+
+    def _local_text(self, audio):
+        text = getattr(audio, "streamed_text", None)
+        if text is not None or self._spotter is None:
+            return text
+        try:
+            return self._spotter.recognize_sphinx(audio, keyword_entries=[(self.wake_phrase, 1e-20)])
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            print(f"Wake phrase spotting unavailable, checking recognized text instead: {e}")
+            self._spotter = None
+            return None
+
+    def _speech_span(self, audio):
+        started = getattr(audio, "speech_started_at", getattr(audio, "started_at", None))
+        ended = getattr(audio, "speech_ended_at", getattr(audio, "ended_at", None))
+        return started, ended
+
+    def playback_ratio(self, audio):
+        """Returns the fraction of a segment's speech during which the assistant was talking."""
+        started, ended = self._speech_span(audio)
+        if started is None or ended is None or ended <= started:
+            return 0.0
+        return speech_worker.speech_overlap(started, ended) / (ended - started)
+
+    def echo(self, text, audio):
+        """Tells whether text repeats a phrase the assistant was playing through most of the segment's speech."""
+        spoken = normalize_command(text)
+        if not spoken or self.playback_ratio(audio) < self.echo_overlap:
+            return False
+        started, ended = self._speech_span(audio)
+        for phrase in speech_worker.phrases_during(started, ended):
+            phrase = normalize_command(phrase)
+            if min(token_set_similarity(spoken, phrase), token_set_similarity(phrase, spoken)) >= 0.8:
+                return True
+        return False
+
+    def check(self, audio):
+        """Returns why a segment should not be recognized ("self_speech", "no_speech", "no_wake_phrase"), or None."""
+        # Mostly the assistant's own voice coming back; dropped before it costs a recognition
+        if self.playback_ratio(audio) >= self.self_speech:
+            return "self_speech"
+        if self.vad:
+            voiced, longest = self.voiced(audio)
+            if voiced < self.min_voiced or longest < self.min_run:
+                return "no_speech"
+        if self.wake_phrase and not self.awake():
+            text = self._local_text(audio)
+            if text is not None and not self._wake_pattern.match(text.lower()):
+                return "no_wake_phrase"
+        return None
+
+    def accept(self, audio):
+        """Returns the segment if it should be recognized, or None; usable as a pipeline stage."""
+        reason = self.check(audio)
+        with self._lock:
+            if reason is None:
+                self.forwarded += 1
+            else:
+                self.gated[reason] += 1
+        if reason is not None:
+            print(f"Ignored a sound before recognition ({reason})")
+            return None
+        return audio
+
+    def accept_text(self, text, audio=None):
+        """Returns the command in recognized text, "" if it was only the wake phrase, or None to drop it.
+
+        audio is the segment the text was recognized from; without it the text is not checked for echo.
+        """
+        if audio is not None and self.echo(text, audio):
+            self._drop("echo")
+            return None
+        if not self.wake_phrase:
+            return text
+        match = self._wake_pattern.match(text.lower())
+        if match:
+            self._awake_until = time.monotonic() + self.wake_window
+            return text[match.end():].strip()
+        if self.awake():
+            self._awake_until = time.monotonic() + self.wake_window
+            return text
+        self._drop("no_wake_phrase")
+        return None
+
+    def _drop(self, reason):
+        with self._lock:
+            self.dropped[reason] += 1
+        print(f"Ignored recognized text ({reason})")
+
+    def stats(self):
+        """Returns how many segments were forwarded to the recognizer and how many were held back, by reason."""
+        with self._lock:
+            return {"forwarded": self.forwarded, "gated": sum(self.gated.values()), "gated_by_reason": dict(self.gated),
+                    "dropped_after_recognition": dict(self.dropped)}
+
+
+def create_gate():
+    """Returns a SpeechGate configured from ALFRED_VAD, ALFRED_VAD_MIN_VOICED, ALFRED_WAKE_PHRASE and ALFRED_WAKE_WINDOW."""
+    return SpeechGate(
+        vad=os.getenv("ALFRED_VAD", "1") != "0",
+        min_voiced=float(os.getenv("ALFRED_VAD_MIN_VOICED", "0.2")),
+        wake_phrase=os.getenv("ALFRED_WAKE_PHRASE") or None,
+        wake_window=float(os.getenv("ALFRED_WAKE_WINDOW", "8")),
+    )
@@ -0,0 +1,189 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+import pyttsx3
+
+# Lower numbers are spoken first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class SpeechWorker:
+    """Owns one pyttsx3 engine on a background thread and speaks queued phrases in priority order.
+
+    say() never blocks. interrupt() stops the current phrase and drops everything queued,
+    and a phrase identical to the previous one is skipped if that one is still pending,
+    playing, or finished less than dedupe_window seconds ago.
+    """
+
+    def __init__(self, rate=None, dedupe_window=1.5):
+        self.rate = rate
+        self.dedupe_window = dedupe_window
+        self.spoken = 0
+        self.deduplicated = 0
+        self.interrupted = 0
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pending = 0
+        self._last_text = None
+        self._last_done = 0.0
+        self._speaking = False
+        self._speaking_until = 0.0
+        # (started, finished, text) of recent phrases in time.monotonic() seconds; finished is None while playing
+        self._played = deque(maxlen=32)
+        self._stop_current = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name="speech", daemon=True)
+        self._thread.start()
+
+    def say(self, text, priority=PRIORITY_NORMAL, interrupt=False, on_done=None):
+        """Queues text to be spoken and returns immediately.
+
+        on_done(started, finished, spoken) is called from the worker thread once the phrase
+        has played, or as soon as it is skipped or dropped (with spoken False).
+        """
+        if interrupt:
+            self.interrupt()
+        with self._lock:
+            duplicate = text == self._last_text and (self._pending or self._speaking or time.monotonic() - self._last_done < self.dedupe_window)
+            if duplicate:
+                self.deduplicated += 1
+            else:
+                self._last_text = text
+                self._pending += 1
+                self._queue.put((priority, next(self._order), self._generation, text, on_done))
+        if duplicate and on_done:
+            now = time.perf_counter()
+            on_done(now, now, False)
+
+    def interrupt(self):
+        """Stops the phrase being spoken and drops all queued phrases (barge-in)."""
+        with self._lock:
+            if not self._pending and not self._speaking:
+                return
+            self._generation += 1
+            self._last_text = None
+            self.interrupted += self._pending + (1 if self._speaking else 0)
+            self._stop_current.set()
+
+    def wait(self, timeout=None):
+        """Blocks until everything queued has been spoken; returns False on timeout."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._pending and not self._speaking, timeout)
+
+    def is_speaking(self, tail=0.0):
+        """Returns True while a phrase is playing or finished less than tail seconds ago."""
+        with self._lock:
+            return self._speaking or time.monotonic() - self._speaking_until < tail
+
+    def overlap(self, start, end):
+        """Returns how many seconds of phrases played between start and end (time.monotonic() seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(max(0.0, min(end, finished or now) - max(start, started))
+                       for started, finished, text in self._played)
+
+    def phrases_during(self, start, end):
+        """Returns the phrases that were playing at some point between start and end (time.monotonic() seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            return [text for started, finished, text in self._played if started < end and (finished or now) > start]
+
+    def stats(self):
+        with self._lock:
+            return {"spoken": self.spoken, "deduplicated": self.deduplicated,
+                    "interrupted": self.interrupted, "pending": self._pending}
+
+    def _run(self):
+        engine = pyttsx3.init()
+        if self.rate:
+            engine.setProperty("rate", self.rate)
+        try:
+            # Driving the loop ourselves lets a phrase be stopped part-way through
+            engine.startLoop(False)
+            manual_loop = True
+        except Exception as e:
+            print(f"Speech engine has no manual loop, phrases cannot be interrupted: {e}")
+            manual_loop = False
+
+        while True:
+            priority, order, generation, text, on_done = self._queue.get()
+            with self._lock:
+                self._pending -= 1
+                dropped = generation != self._generation
+                if dropped:
+                    self._idle.notify_all()
+                else:
+                    self._speaking = True
+                    self._stop_current.clear()
+                    played = [time.monotonic(), None, text]
+                    self._played.append(played)
+            started = time.perf_counter()
+            if dropped:
+                if on_done:
+                    on_done(started, started, False)
+                continue
+            try:
+                engine.say(text)
+                if manual_loop:
+                    engine.iterate()
+                    while engine.isBusy():
+                        if self._stop_current.is_set():
+                            engine.stop()
+                            break
+                        engine.iterate()
+                        time.sleep(0.01)
+                else:
+                    engine.runAndWait()
+            except Exception as e:
+                print(f"Error speaking '{text}': {e}")
+            with self._lock:
+                self._speaking = False
+                self._speaking_until = self._last_done = played[1] = time.monotonic()
+                self.spoken += 1
+                self._idle.notify_all()
+            if on_done:
+                on_done(started, time.perf_counter(), True)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_speech_worker():
+    """Returns the process-wide speech worker, starting it on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SpeechWorker()
+        return _worker
+
+
+def speak(text, priority=PRIORITY_NORMAL, interrupt=False, wait=False, on_done=None):
+    """Speaks text on the shared worker; only blocks when wait is True."""
+    worker = get_speech_worker()
+    worker.say(text, priority=priority, interrupt=interrupt, on_done=on_done)
+    if wait:
+        worker.wait(timeout=30)
+
+
+def speech_overlap(start, end):
+    """Seconds the shared worker spent speaking between start and end; 0 if it has not been started."""
+    return _worker.overlap(start, end) if _worker is not None else 0.0
+
+
+def phrases_during(start, end):
+    """Phrases the shared worker was speaking at some point between start and end."""
+    return _worker.phrases_during(start, end) if _worker is not None else []
+
+
+def interrupt_speech():
+    """Cuts off whatever the shared worker is saying, if it has been started."""
+    if _worker is not None:
+        _worker.interrupt()
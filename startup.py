@@ -0,0 +1,68 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Taken when the first assistant module imports this one, as close to launch as we can get
+LAUNCHED = time.perf_counter()
+
+
+class StartupTimer:
+    """Records how long each import and initialization step of startup takes.
+
+    Steps run with timed() on the main thread or with warm() on a background thread;
+    mark() notes how long after launch a milestone such as "listening" was reached.
+    """
+
+    def __init__(self, launched=LAUNCHED):
+        self.launched = launched
+        self.steps = []
+        self.marks = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, started, threading.current_thread().name)
+
+    def warm(self, name, function):
+        """Runs function on a background thread so its cost overlaps the rest of startup."""
+        def run():
+            with self.timed(name):
+                try:
+                    function()
+                except Exception as e:
+                    print(f"Background warm-up of {name} failed: {e}")
+        thread = threading.Thread(target=run, name=f"warm-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def mark(self, name):
+        with self._lock:
+            self.marks.append((name, time.perf_counter() - self.launched))
+
+    def _add(self, name, started, thread):
+        with self._lock:
+            self.steps.append((name, started - self.launched, time.perf_counter() - started, thread))
+
+    def report(self):
+        """Returns a text table of the steps in launch order, then the milestones."""
+        with self._lock:
+            steps = sorted(self.steps, key=lambda step: step[1])
+            marks = list(self.marks)
+        lines = [f"{'startup step':<32}{'at ms':>8}{'took ms':>9}  thread"]
+        for name, offset, duration, thread in steps:
+            lines.append(f"{name:<32}{offset * 1000:>8.0f}{duration * 1000:>9.0f}  {thread}")
+        for name, offset in marks:
+            lines.append(f"{name + ' reached':<32}{offset * 1000:>8.0f}")
+        return "\n".join(lines)
+
+
+_timer = StartupTimer()
+
+
+def get_startup_timer():
+    """Returns the process-wide startup timer."""
+    return _timer
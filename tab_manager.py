@@ -0,0 +1,161 @@
+import os
+from collections import OrderedDict
+
+from fuzzy_match import default_threshold, token_set_similarity
+from intent_parser import WEBSITE_MAP
+from site_adapters import domain_of
+
+
+class TabManager:
+    """Lists, closes and switches the browser's tabs by window handle instead of keyboard shortcuts.
+
+    Tabs are listed with one DevTools Target.getTargets call and closed in one batch of
+    Target.closeTarget calls, without switching to each tab; drivers without DevTools fall
+    back to visiting the tabs. Handles are kept in least-recently-used order, and when more
+    than max_tabs tabs are open the least recently used ones are closed, except the current
+    tab and the session's warm tabs. max_tabs of 0 turns the limit off.
+    """
+
+    def __init__(self, session=None, max_tabs=12):
+        self.session = session
+        self.max_tabs = max_tabs
+        # Handles in the order they were last used, least recent first
+        self._recent = OrderedDict()
+        self.closed = 0
+        self.evicted = 0
+        self.switches = 0
+
+    def tabs(self, driver):
+        """Returns [{"handle", "title", "url"}] for every open tab, in tab order."""
+        handles = driver.window_handles
+        try:
+            targets = driver.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]
+            pages = {target["targetId"]: target for target in targets if target.get("type") == "page"}
+            # Chromium drivers use the DevTools target id as the window handle
+            if all(handle in pages for handle in handles):
+                return [{"handle": handle, "title": pages[handle].get("title", ""), "url": pages[handle].get("url", "")}
+                        for handle in handles]
+        except Exception as e:
+            print(f"Could not list tabs through DevTools: {e}")
+        current = driver.current_window_handle
+        result = []
+        for handle in handles:
+            driver.switch_to.window(handle)
+            result.append({"handle": handle, "title": driver.title, "url": driver.current_url})
+        driver.switch_to.window(current)
+        return result
+
+    def touch(self, driver):
+        """Marks the current tab as just used, then closes the least recently used tabs over the limit."""
+        try:
+            handle = driver.current_window_handle
+        except Exception:
+            return
+        self._recent[handle] = None
+        self._recent.move_to_end(handle)
+        self.evict(driver)
+
+    def _by_recency(self, handles):
+        """Returns handles least recently used first; tabs never used count as the oldest."""
+        unused = [handle for handle in handles if handle not in self._recent]
+        used = [handle for handle in self._recent if handle in handles]
+        return unused + used
+
+    def _protected(self):
+        return set(self.session.warm_tabs.values()) if self.session is not None else set()
+
+    def close(self, driver, handles):
+        """Closes the given tabs in one batch and returns how many were closed.
+
+        The driver is left on the current tab, or on the most recently used tab that is
+        still open; if every tab is closed, a blank one is opened first.
+        """
+        handles = [handle for handle in handles if handle in driver.window_handles]
+        if not handles:
+            return 0
+        current = driver.current_window_handle
+        remaining = [handle for handle in driver.window_handles if handle not in handles]
+        if current in handles:
+            if remaining:
+                driver.switch_to.window(self._by_recency(remaining)[-1])
+            elif self.session is not None:
+                self.session.new_tab(driver)
+            else:
+                driver.switch_to.new_window("tab")
+        keep = driver.current_window_handle
+        for handle in handles:
+            try:
+                driver.execute_cdp_cmd("Target.closeTarget", {"targetId": handle})
+            except Exception:
+                driver.switch_to.window(handle)
+                driver.close()
+                driver.switch_to.window(keep)
+            self._recent.pop(handle, None)
+        if self.session is not None:
+            for site, handle in list(self.session.warm_tabs.items()):
+                if handle in handles:
+                    del self.session.warm_tabs[site]
+        self.closed += len(handles)
+        self.touch(driver)
+        return len(handles)
+
+    def close_recent(self, driver, count):
+        """Closes the current tab and the count - 1 tabs used most recently before it."""
+        handles = driver.window_handles
+        current = driver.current_window_handle
+        ordered = [current] + [handle for handle in reversed(self._by_recency(handles)) if handle != current]
+        return self.close(driver, ordered[:count])
+
+    def close_site(self, driver, site):
+        """Closes every tab showing site, e.g. "youtube" or "youtube.com"."""
+        domain = WEBSITE_MAP.get(site, site).lower()
+        matches = lambda host: host == domain or host.endswith("." + domain) or ("." not in domain and domain in host.split("."))
+        return self.close(driver, [tab["handle"] for tab in self.tabs(driver) if matches(domain_of(tab["url"]))])
+
+    def close_target(self, driver, target):
+        """Closes the tabs a close_tabs command names: a count, "all", or a site."""
+        if target.isdigit():
+            return self.close_recent(driver, int(target))
+        if target == "all":
+            return self.close(driver, driver.window_handles)
+        return self.close_site(driver, target)
+
+    def switch(self, driver, name, threshold=None):
+        """Switches to the tab whose site or title best matches a spoken name; returns the tab or None."""
+        threshold = default_threshold() if threshold is None else threshold
+        domain = WEBSITE_MAP.get(name, name).lower()
+        best, best_score = None, threshold
+        for tab in self.tabs(driver):
+            host = domain_of(tab["url"])
+            score = 1.0 if host == domain or domain in host.split(".") else token_set_similarity(name, tab["title"])
+            if score > best_score or (best is None and score >= best_score):
+                best, best_score = tab, score
+        if best is not None:
+            driver.switch_to.window(best["handle"])
+            self.switches += 1
+            self.touch(driver)
+        return best
+
+    def evict(self, driver):
+        """Closes the least recently used tabs while more than max_tabs are open; returns how many."""
+        handles = driver.window_handles
+        if not self.max_tabs or len(handles) <= self.max_tabs:
+            return 0
+        protected = self._protected() | {driver.current_window_handle}
+        candidates = [handle for handle in self._by_recency(handles) if handle not in protected]
+        victims = candidates[:len(handles) - self.max_tabs]
+        if not victims:
+            return 0
+        print(f"Closing {len(victims)} least recently used tabs")
+        closed = self.close(driver, victims)
+        self.evicted += closed
+        return closed
+
+    def stats(self):
+        return {"max_tabs": self.max_tabs, "tracked": len(self._recent), "closed": self.closed,
+                "evicted": self.evicted, "switches": self.switches}
+
+
+def create_tab_manager(session):
+    """Returns a TabManager for session, limited to ALFRED_MAX_TABS open tabs (default 12, 0 for no limit)."""
+    return TabManager(session, max_tabs=int(os.getenv("ALFRED_MAX_TABS", "12")))
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from command_queue import CommandQueue, DROP_NEWEST, DROP_OLDEST
+
+
+def test_repeats_with_the_same_key_are_coalesced():
+    queue = CommandQueue()
+    first = queue.put("scroll down", key=("scroll", "down"))
+    assert queue.put("scroll down", key=("scroll", "down")) is first
+    queue.put("search cats")
+    queue.put("scroll down", key=("scroll", "down"))
+    assert [(command.value, command.count) for command in (queue.get(), queue.get(), queue.get())] == [
+        ("scroll down", 2), ("search cats", 1), ("scroll down", 1)]
+    assert queue.stats()["coalesced"] == 1
+
+
+def test_stale_commands_are_expired():
+    queue = CommandQueue(max_age=0.05)
+    queue.put("old")
+    time.sleep(0.1)
+    queue.put("new")
+    assert queue.get().value == "new"
+    assert queue.stats()["expired"] == 1
+
+
+def test_cancel_pending_drops_waiting_commands():
+    queue = CommandQueue()
+    for value in ("one", "two", "three"):
+        queue.put(value)
+    assert queue.cancel_pending() == 3
+    assert queue.get(timeout=0.01) is None
+    assert queue.stats()["cancelled"] == 3
+
+
+def test_full_queue_policies():
+    oldest = CommandQueue(maxsize=2, policy=DROP_OLDEST)
+    newest = CommandQueue(maxsize=2, policy=DROP_NEWEST)
+    for value in ("one", "two", "three"):
+        oldest.put(value)
+        newest.put(value)
+    assert [oldest.get().value, oldest.get().value] == ["two", "three"]
+    assert [newest.get().value, newest.get().value] == ["one", "two"]
+    assert oldest.stats()["dropped"] == newest.stats()["dropped"] == 1
+
+
+def test_blocking_put_waits_for_room_and_close_wakes_readers():
+    queue = CommandQueue(maxsize=1)
+    queue.put("one")
+    putter = threading.Thread(target=queue.put, args=("two",))
+    putter.start()
+    time.sleep(0.05)
+    assert putter.is_alive()
+    assert queue.get().value == "one"
+    putter.join(1)
+    assert queue.get().value == "two"
+    queue.close()
+    assert queue.get() is None
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient, is_retryable
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeModel:
+    """Answers with replies in order, the last one repeated; exceptions are raised, (seconds, reply) waits first."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, tuple):
+            delay, reply = reply
+            await asyncio.sleep(delay)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def client(model, **options):
+    options = {"timeout": 0.5, "deadline": 1.0, "retries": 2, "backoff": 0.01, **options}
+    return GeminiClient(model, **options)
+
+
+def test_retryable_errors():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(APIError(429))
+    assert is_retryable(APIError(503))
+    assert not is_retryable(APIError(400))
+    assert not is_retryable(APIError(403))
+    assert not is_retryable(ValueError("bad request"))
+
+
+def test_transient_errors_are_retried():
+    model = FakeModel(ConnectionResetError(), APIError(503), "ok")
+    gemini = client(model)
+    assert gemini.generate("scroll down") == "ok"
+    assert gemini.stats()["retries"] == 2
+    assert gemini.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_errors_that_cannot_succeed_fail_fast():
+    model = FakeModel(APIError(400), "ok")
+    gemini = client(model, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(APIError):
+        gemini.generate("scroll down")
+    assert len(model.prompts) == 1
+    assert gemini.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_attempts_time_out_within_the_deadline():
+    gemini = client(FakeModel((5, "late")), timeout=0.05, deadline=0.3)
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        gemini.generate("scroll down")
+    assert time.monotonic() - started < 0.6
+    assert gemini.stats()["timeouts"] >= 2
+
+
+def test_hedged_request_wins_when_the_first_is_slow():
+    gemini = client(FakeModel((5, "late"), "fast"), hedge_after=0.05)
+    assert gemini.generate("scroll down") == "fast"
+    stats = gemini.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.open_count == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_open_breaker_short_circuits_calls():
+    model = FakeModel(ConnectionResetError())
+    gemini = client(model, retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    with pytest.raises(ConnectionResetError):
+        gemini.generate("scroll down")
+    with pytest.raises(CircuitOpenError):
+        gemini.generate("scroll down")
+    assert len(model.prompts) == 1
+    assert gemini.stats()["short_circuits"] == 1
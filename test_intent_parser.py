@@ -0,0 +1,54 @@
+from intent_parser import fallback_parse, parse_command, parse_local, parse_plan
+
+
+def command(intent, target, **parameters):
+    return {"intent": intent, "target": target, "parameters": parameters}
+
+
+def test_search_keeps_the_query_as_spoken():
+    assert parse_command("search just dance") == command("search", "just dance")
+    assert parse_command("search hey jude") == command("search", "hey jude")
+    assert parse_command("search c++") == command("search", "c++")
+    assert parse_command("Hey Alfred, search Lo-Fi Beats.") == command("search", "Lo-Fi Beats")
+
+
+def test_click_keeps_filler_like_targets():
+    assert parse_command("click on ok") == command("click", "ok")
+    assert parse_command("click on just now") == command("click", "just now")
+
+
+def test_keywords_are_matched_in_any_case():
+    assert parse_command("Open YouTube") == command("open_website", "youtube.com")
+    assert parse_command("Scroll Down now") == command("scroll", "down")
+    assert parse_command("close 3 tabs") == command("close_tabs", "3")
+    assert parse_command("switch to the GitHub tab") == command("switch_tab", "GitHub")
+
+
+def test_plan_steps_keep_their_payloads():
+    plan = parse_plan("Open YouTube, search Just Dance and then click on ok")
+    assert plan == command("plan", None, steps=[
+        command("open_website", "youtube.com"),
+        command("search", "Just Dance"),
+        command("click", "ok"),
+    ])
+
+
+def test_fallback_keeps_the_query_as_spoken():
+    assert fallback_parse("could you please search Just Dance") == command("search", "Just Dance")
+    assert fallback_parse("Weather in Paris") == command("search", "Weather in Paris")
+
+
+def test_plan_steps_may_contain_separators():
+    assert parse_local("search tom and jerry and scroll down") == command("plan", None, steps=[
+        command("search", "tom and jerry"),
+        command("scroll", "down"),
+    ])
+    assert parse_local("search salt and pepper then scroll down") == command("plan", None, steps=[
+        command("search", "salt and pepper"),
+        command("scroll", "down"),
+    ])
+    assert parse_local("search tom and jerry") == command("search", "tom and jerry")
+
+
+def test_compound_commands_that_do_not_split_go_to_gemini():
+    assert parse_local("search cats and open youtube then do the thing") is None
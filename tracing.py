@@ -0,0 +1,258 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class Trace:
+    """Timing record of one voice command from capture to the last spoken reply."""
+
+    def __init__(self, trace_id, text=None):
+        self.id = trace_id
+        self.text = text
+        self.intent = None
+        self.started = time.perf_counter()
+        self.spans = []
+        self.finished = False
+        self.pending = 0
+
+    def total(self):
+        ends = [start + duration for _, start, duration, _ in self.spans]
+        starts = [start for _, start, _, _ in self.spans]
+        return max(ends) - min(starts) if self.spans else time.perf_counter() - self.started
+
+    def to_dict(self):
+        origin = min([start for _, start, _, _ in self.spans] + [self.started])
+        return {
+            "id": self.id,
+            "text": self.text,
+            "intent": self.intent,
+            "total": round(self.total(), 4),
+            "spans": [{"name": name, "start": round(start - origin, 4), "duration": round(duration, 4), **detail}
+                      for name, start, duration, detail in self.spans],
+        }
+
+
+class Tracer:
+    """Assigns each command a trace, records spans for each stage, and keeps rolling latency histograms.
+
+    Spans are recorded against the trace made current on this thread by use(). Finished
+    traces, including what was said, are appended as JSON lines to export_path when one is
+    given, and any command slower than
+    slow_threshold seconds is dumped with its spans sorted by duration.
+    """
+
+    def __init__(self, export_path=None, summary_path=None, window=500, slow_threshold=3.0):
+        self.export_path = export_path
+        self.summary_path = summary_path
+        self.window = window
+        self.slow_threshold = slow_threshold
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(lambda: deque(maxlen=self.window))
+        self._finished_count = 0
+
+    def start(self, text=None):
+        """Creates a trace for a new command."""
+        return Trace(next(self._ids), text)
+
+    def current(self):
+        return getattr(self._local, "trace", None)
+
+    @contextmanager
+    def use(self, trace):
+        """Makes trace the target of span() calls on this thread."""
+        previous = self.current()
+        self._local.trace = trace
+        try:
+            yield trace
+        finally:
+            self._local.trace = previous
+
+    @contextmanager
+    def span(self, name, **detail):
+        """Times the enclosed block as a span of the current trace."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(self.current(), name, time.perf_counter() - started, started, **detail)
+
+    def add_span(self, trace, name, duration, start=None, **detail):
+        """Records a span measured elsewhere, such as the audio of an utterance or a queue wait."""
+        if start is None:
+            start = time.perf_counter() - duration
+        with self._lock:
+            if trace is None:
+                self._histograms[("*", name)].append(duration)
+                return
+            trace.spans.append((name, start, duration, detail))
+            if trace.finished:
+                self._histograms[(trace.intent, name)].append(duration)
+
+    def expect(self, trace):
+        """Notes that a span (usually TTS) will be added later; export waits for it."""
+        if trace is not None:
+            with self._lock:
+                trace.pending += 1
+
+    def fulfil(self, trace, name, duration, start=None, **detail):
+        """Adds a span announced by expect() and exports the trace if it was the last one."""
+        if trace is None:
+            return
+        self.add_span(trace, name, duration, start, **detail)
+        with self._lock:
+            trace.pending -= 1
+            ready = trace.finished and trace.pending == 0
+        if ready:
+            self._export(trace)
+
+    def finish(self, trace, intent):
+        """Closes a trace, adds its spans to the per-intent histograms and exports it."""
+        if trace is None:
+            return
+        with self._lock:
+            trace.intent = intent or "unknown"
+            trace.finished = True
+            for name, _, duration, _ in trace.spans:
+                self._histograms[(trace.intent, name)].append(duration)
+            total = trace.total()
+            self._histograms[(trace.intent, "total")].append(total)
+            self._finished_count += 1
+            ready = trace.pending == 0
+            write_summary = self._finished_count % 10 == 0
+        if total > self.slow_threshold:
+            self.dump(trace)
+        if ready:
+            self._export(trace)
+        if write_summary:
+            self.write_summary()
+
+    def dump(self, trace):
+        """Prints where the time of a slow command went."""
+        print(f"Slow command #{trace.id} '{trace.text}' ({trace.intent}) took {trace.total():.2f} s:")
+        for name, _, duration, detail in sorted(trace.spans, key=lambda span: span[2], reverse=True)[:10]:
+            details = ", ".join(f"{key}={value}" for key, value in detail.items())
+            print(f"  {duration * 1000:8.1f} ms  {name}" + (f"  ({details})" if details else ""))
+
+    def percentiles(self, intent, stage="total"):
+        """Returns count, p50, p95 and p99 in seconds for one intent and stage."""
+        with self._lock:
+            samples = sorted(self._histograms.get((intent, stage), ()))
+        if not samples:
+            return None
+        pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+        return {"count": len(samples), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def summary(self):
+        """Returns {intent: {stage: percentiles}} for everything recorded so far."""
+        with self._lock:
+            keys = list(self._histograms)
+        result = defaultdict(dict)
+        for intent, stage in sorted(keys):
+            stats = self.percentiles(intent, stage)
+            if stats:
+                result[intent][stage] = {key: round(value, 4) for key, value in stats.items()}
+        return dict(result)
+
+    def report(self):
+        """Returns a text table of the per-intent, per-stage percentiles."""
+        lines = [f"{'intent':<14}{'stage':<28}{'count':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for intent, stages in self.summary().items():
+            for stage, stats in stages.items():
+                lines.append(f"{intent:<14}{stage:<28}{stats['count']:>6}{stats['p50'] * 1000:>10.1f}"
+                             f"{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}")
+        return "\n".join(lines)
+
+    def write_summary(self):
+        if not self.summary_path:
+            return
+        try:
+            with open(self.summary_path, "w") as f:
+                json.dump(self.summary(), f, indent=2)
+        except OSError as e:
+            print(f"Could not write latency summary: {e}")
+
+    def _export(self, trace):
+        if not self.export_path:
+            return
+        try:
+            with self._lock, open(self.export_path, "a") as f:
+                f.write(json.dumps(trace.to_dict()) + "\n")
+        except OSError as e:
+            print(f"Could not export trace: {e}")
+
+
+class TracedDriver:
+    """Wraps a WebDriver so every driver call is recorded as a span of the current trace."""
+
+    def __init__(self, driver, tracer):
+        self._driver = driver
+        self._tracer = tracer
+        self.call_count = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self._driver, name)
+        if not callable(attribute):
+            return attribute
+
+        def traced(*args, **kwargs):
+            self.call_count += 1
+            with self._tracer.span(f"webdriver.{name}", **_describe_call(name, args)):
+                return attribute(*args, **kwargs)
+        return traced
+
+    @property
+    def current_url(self):
+        self.call_count += 1
+        with self._tracer.span("webdriver.current_url"):
+            return self._driver.current_url
+
+    @property
+    def unwrapped(self):
+        return self._driver
+
+
+def _describe_call(name, args):
+    if not args:
+        return {}
+    first = args[0]
+    if name == "execute_script" and isinstance(first, str):
+        # Scripts that share a long prelude are told apart by their last line
+        return {"script": first.strip().splitlines()[-1][:80]}
+    if name in ("find_element", "find_elements") and len(args) > 1:
+        return {"selector": f"{first}={args[1]}"[:120]}
+    if isinstance(first, str):
+        return {"arg": first[:120]}
+    return {}
+
+
+def _default_path(variable, file_name):
+    value = os.getenv(variable)
+    if value is not None:
+        return value or None
+    directory = os.path.join(os.path.expanduser("~"), ".alfred")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, file_name)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Returns the process-wide tracer configured from ALFRED_TRACE_FILE, ALFRED_LATENCY_SUMMARY and ALFRED_SLOW_COMMAND."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(
+                # Traces hold the transcript of every command, so they are only written when asked for
+                export_path=os.getenv("ALFRED_TRACE_FILE") or None,
+                summary_path=_default_path("ALFRED_LATENCY_SUMMARY", "latency_summary.json"),
+                slow_threshold=float(os.getenv("ALFRED_SLOW_COMMAND", "3")),
+            )
+        return _tracer